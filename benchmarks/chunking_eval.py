@@ -0,0 +1,79 @@
+"""Chunking evaluation: chunk count, embedded tokens, index size and retrieval hit rate per strategy.
+
+Usage:
+    python benchmarks/chunking_eval.py [--k 3] [--documents 12]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from chunking import StructureAwareSplitter, get_token_counter
+from embeddings import get_embeddings
+from sample_corpus import build_corpus
+
+
+def chunk_recursive(docs):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    chunks, metadatas = [], []
+    for name, sections in docs:
+        for chunk in splitter.split_text("\n".join(text for text, _ in sections)):
+            chunks.append(chunk)
+            metadatas.append({"source": name})
+    return chunks, metadatas
+
+
+def chunk_structure(docs, count_tokens, overlap):
+    splitter = StructureAwareSplitter(overlap_tokens=overlap, count_tokens=count_tokens)
+    chunks, metadatas = [], []
+    for name, sections in docs:
+        doc_chunks, doc_metadatas = splitter.split_sections(sections)
+        chunks.extend(doc_chunks)
+        metadatas.extend(dict(m, source=name) for m in doc_metadatas)
+    return chunks, metadatas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--documents", type=int, default=12)
+    args = parser.parse_args()
+
+    docs, questions = build_corpus(documents=args.documents)
+    embeddings = get_embeddings()
+    count_tokens = get_token_counter()
+
+    strategies = {
+        "recursive 1000/200": lambda: chunk_recursive(docs),
+        "structure (overlap 24)": lambda: chunk_structure(docs, count_tokens, 24),
+        "structure (overlap 0)": lambda: chunk_structure(docs, count_tokens, 0),
+    }
+
+    print(f"{'strategy':<24}{'chunks':>8}{'tokens':>9}{'>256 tok':>10}{'index KB':>10}{'embed s':>9}{'hit@' + str(args.k):>8}")
+    for name, build in strategies.items():
+        chunks, metadatas = build()
+        sizes = count_tokens(chunks)
+        t = time.perf_counter()
+        store = FAISS.from_texts(chunks, embeddings, metadatas=metadatas)
+        embed_s = time.perf_counter() - t
+        index_kb = (store.index.ntotal * store.index.d * 4 + sum(len(c.encode()) for c in chunks)) / 1024
+
+        hits = 0
+        for question, answer, source in questions:
+            results = store.similarity_search(question, k=args.k)
+            hits += any(answer in doc.page_content and doc.metadata["source"] == source for doc in results)
+
+        truncated = sum(size > 256 for size in sizes)
+        print(f"{name:<24}{len(chunks):>8}{sum(sizes):>9}{truncated:>10}{index_kb:>10.0f}{embed_s:>9.2f}"
+              f"{hits / len(questions):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""End-to-end turn benchmark against local stand-ins for Groq, Serper and Hugging Face.
+
+Runs the headless chat engine (prompt and payload building, tool dispatch, streaming) for
+N concurrent simulated users on one event loop and reports turn latency, time-to-first-token
+and throughput.
+No API keys are needed: a mock server is started in-process unless --mock-port is given.
+
+Usage:
+    python benchmarks/e2e.py [--users 8] [--turns 5] [--search-ratio 0.2] [--image-ratio 0.1]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_servers import MockSettings, endpoint_env, start_mock_server
+
+CASUAL = ["Summarize the main risks in our projects.", "Explain vendor lock-in in simple terms.",
+          "What should we prioritize next quarter?", "Give me three tips for better status reports."]
+SEARCH = ["Search the latest news on cloud pricing.", "What is the latest Python release? Search it."]
+IMAGE = ["Draw a picture of a lighthouse at dusk.", "Generate an image of a data center."]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+async def simulate_user(engine, user_id, args, results):
+    rng = random.Random(user_id)
+    messages = [{"role": "assistant", "content": "Welcome to **InsightBot**. How can I help you today?"}]
+    for _ in range(args.turns):
+        roll = rng.random()
+        pool = IMAGE if roll < args.image_ratio else SEARCH if roll < args.image_ratio + args.search_ratio else CASUAL
+        messages.append({"role": "user", "content": rng.choice(pool)})
+
+        started = time.perf_counter()
+        ttft = None
+        async for event in engine.run_turn(messages, session_id=f"user-{user_id}"):
+            if event["type"] == "token" and ttft is None:
+                ttft = (time.perf_counter() - started) * 1000
+            elif event["type"] == "done":
+                trace = event["trace"]
+        # Image turns answer without any text tokens: the whole answer arrives at once
+        results.append((trace, ttft if ttft is not None else trace["duration_ms"]))
+
+
+async def run_users(args):
+    from chat_engine import ChatEngine
+
+    results = []
+    async with ChatEngine() as engine:
+        await asyncio.gather(*(simulate_user(engine, u, args, results) for u in range(args.users)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--search-ratio", type=float, default=0.2)
+    parser.add_argument("--image-ratio", type=float, default=0.1)
+    parser.add_argument("--llm-ms", type=int, default=300)
+    parser.add_argument("--token-ms", type=int, default=15)
+    parser.add_argument("--search-ms", type=int, default=400)
+    parser.add_argument("--image-ms", type=int, default=1500)
+    parser.add_argument("--mock-port", type=int, default=0, help="use an already running mock_servers.py")
+    args = parser.parse_args()
+
+    port = args.mock_port
+    if not port:
+        settings = MockSettings(args.llm_ms, args.token_ms, args.search_ms, args.image_ms)
+        port = start_mock_server(settings).server_port
+    os.environ.update(endpoint_env(port))
+    # Generated images are written relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="insightbot-e2e-"))
+
+    started = time.perf_counter()
+    results = asyncio.run(run_users(args))
+    wall = time.perf_counter() - started
+
+    turns = [trace["duration_ms"] for trace, _ in results]
+    ttfts = [ttft for _, ttft in results]
+    print(f"users={args.users} turns/user={args.turns} total turns={len(results)} wall={wall:.2f}s")
+    print(f"  turn latency  p50 {percentile(turns, 0.5):8.1f} ms   p95 {percentile(turns, 0.95):8.1f} ms")
+    print(f"  first token   p50 {percentile(ttfts, 0.5):8.1f} ms   p95 {percentile(ttfts, 0.95):8.1f} ms")
+    print(f"  throughput    {len(results) / wall:8.2f} turns/s")
+
+    stages = {}
+    for trace, _ in results:
+        for s in trace["spans"]:
+            stages.setdefault(s["name"], []).append(s["duration_ms"])
+    print("\n  stage               count    mean ms     p95 ms")
+    for name, durations in sorted(stages.items()):
+        print(f"  {name:<18}{len(durations):>7}{statistics.mean(durations):>11.1f}{percentile(durations, 0.95):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Embedding backend benchmark: throughput (chunks/sec) and retrieval agreement with the torch backend.
+
+Usage:
+    python benchmarks/embedding_backends.py [--chunks 2000] [--batch-size 32] [--threads 0] [--k 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from embeddings import BACKENDS, get_embeddings
+
+TOPICS = ["invoice totals", "employee onboarding", "network outages", "quarterly revenue",
+          "security policy", "travel expenses", "product roadmap", "customer churn",
+          "data retention", "incident response"]
+
+
+def make_corpus(n):
+    chunks = [
+        f"Record {i}: this section of the report discusses {TOPICS[i % len(TOPICS)]} "
+        f"for region {i % 17} and lists {i % 9 + 1} follow-up actions owned by team {i % 23}."
+        for i in range(n)
+    ]
+    queries = [f"What follow-up actions were listed for {topic} in region {i}?"
+               for i, topic in enumerate(TOPICS)]
+    return chunks, queries
+
+
+def top_k(doc_vectors, query_vectors, k):
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    chunks, queries = make_corpus(args.chunks)
+    baseline = None
+
+    print(f"{'backend':<12}{'load s':>9}{'chunks/s':>11}{'agree@' + str(args.k):>10}{'cosine':>9}")
+    for backend in BACKENDS:
+        try:
+            t = time.perf_counter()
+            embedder = get_embeddings(backend, batch_size=args.batch_size, threads=args.threads)
+            load_s = time.perf_counter() - t
+        except Exception as e:
+            print(f"{backend:<12} unavailable: {e}")
+            continue
+
+        embedder.embed_documents(chunks[:args.batch_size])  # warm-up
+        t = time.perf_counter()
+        doc_vectors = np.asarray(embedder.embed_documents(chunks), dtype=np.float32)
+        throughput = len(chunks) / (time.perf_counter() - t)
+        query_vectors = np.asarray(embedder.embed_documents(queries), dtype=np.float32)
+        ranking = top_k(doc_vectors, query_vectors, args.k)
+
+        if baseline is None:
+            baseline = (doc_vectors, ranking)
+            agreement, cosine = 1.0, 1.0
+        else:
+            base_vectors, base_ranking = baseline
+            agreement = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ranking, base_ranking)])
+            norms = np.linalg.norm(doc_vectors, axis=1) * np.linalg.norm(base_vectors, axis=1)
+            cosine = float(np.mean(np.sum(doc_vectors * base_vectors, axis=1) / norms))
+
+        print(f"{backend:<12}{load_s:>9.2f}{throughput:>11.1f}{agreement:>10.3f}{cosine:>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
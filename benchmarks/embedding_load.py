@@ -0,0 +1,84 @@
+"""Embedding load test: many concurrent sessions uploading documents and asking questions.
+
+Compares embedding in-process (every session calls the model on its own thread) with the
+shared EmbeddingService worker pool.
+
+Usage:
+    python benchmarks/embedding_load.py [--users 16] [--chunks 200] [--queries 10] [--workers 2]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embeddings import embed_queries, get_embeddings
+
+
+def simulate_user(user_id, embedder, chunks, queries, results):
+    upload = [f"User {user_id} document chunk {i}: quarterly metrics, owners and follow-up actions."
+              for i in range(chunks)]
+    t = time.perf_counter()
+    embedder.embed_documents(upload)
+    upload_s = time.perf_counter() - t
+
+    latencies = []
+    for q in range(queries):
+        t = time.perf_counter()
+        embed_queries(embedder, [f"User {user_id} question {q}: who owns the follow-up actions?"])
+        latencies.append(time.perf_counter() - t)
+        time.sleep(0.05)  # think time between turns
+    results.append((upload_s, latencies))
+
+
+def run(name, embedder, args):
+    results = []
+    threads = [threading.Thread(target=simulate_user, args=(u, embedder, args.chunks, args.queries, results))
+               for u in range(args.users)]
+    t = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - t
+
+    uploads = sorted(r[0] for r in results)
+    queries = sorted(l for r in results for l in r[1])
+    total_texts = args.users * (args.chunks + args.queries)
+    print(f"\n== {name} ==")
+    print(f"  wall time               {wall:8.2f} s")
+    print(f"  throughput              {total_texts / wall:8.1f} texts/s")
+    print(f"  upload p50 / p95        {statistics.median(uploads):8.2f} / {uploads[int(len(uploads) * 0.95) - 1]:.2f} s")
+    print(f"  query p50 / p95         {statistics.median(queries) * 1000:8.1f} / {queries[int(len(queries) * 0.95) - 1] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=int, default=10)
+    args = parser.parse_args()
+
+    embedder = get_embeddings()
+    embedder.embed_query("warm-up")
+    run("in-process", embedder, args)
+
+    from embedding_service import EmbeddingService, RemoteEmbeddings
+    service = EmbeddingService(args.workers, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    remote = RemoteEmbeddings(service)
+    remote.embed_query("warm-up")  # waits for the first worker to load the model
+    run(f"worker pool ({args.workers} workers)", remote, args)
+    stats = service.stats()
+    print(f"  batches / avg size      {stats['batches']} / {stats['avg_batch_size']:.1f}")
+    service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Local stand-ins for the Groq, Serper and Hugging Face APIs with configurable latency.
+
+Routes (one server, one port):
+    POST /openai/v1/chat/completions   Groq chat completions, JSON or SSE streaming, with tool calls
+    POST /search                       Serper search results
+    POST /hf/text-to-image             Hugging Face text-to-image (returns a PNG)
+
+Messages containing "search", "latest" or "news" trigger a web_search tool call and
+messages containing "draw", "image" or "picture" trigger a generate_image tool call,
+when the request offers tools. With --rpm / --tpm the chat endpoint enforces Groq-style
+per-minute limits over a sliding window and answers 429 with Retry-After when exceeded.
+
+Usage:
+    python benchmarks/mock_servers.py [--port 8765] [--llm-ms 300] [--token-ms 15] [--rpm 30] [--tpm 6000]
+"""
+import argparse
+import base64
+import json
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 1x1 transparent PNG
+PNG_BYTES = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+ANSWER = ("InsightBot mock answer. The quarterly report shows steady growth across all regions, "
+          "with the largest gains in the northern markets. Key risks remain vendor lock-in and "
+          "procurement delays. Recommended next steps are to renegotiate support contracts and "
+          "freeze scope three weeks before launch.")
+
+SEARCH_WORDS = ("search", "latest", "news")
+IMAGE_WORDS = ("draw", "image", "picture")
+
+
+class MockSettings:
+    def __init__(self, llm_ms=300, token_ms=15, search_ms=400, image_ms=1500, answer_tokens=60, rpm=0, tpm=0,
+                 window_s=60):
+        self.llm_ms = llm_ms
+        self.token_ms = token_ms
+        self.search_ms = search_ms
+        self.image_ms = image_ms
+        self.answer_tokens = answer_tokens
+        # Per-minute chat limits (0 = unlimited); benchmarks may shorten the minute to window_s
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window_s = window_s
+        self.window = deque()  # (time, tokens) of chat requests accepted in the last minute
+        self.lock = threading.Lock()
+        self.requests = {"chat": 0, "search": 0, "image": 0, "rate_limited": 0}
+
+    def admit(self, tokens):
+        """Charge one chat request against the limits; returns (retry_after_s or 0, remaining headers)."""
+        with self.lock:
+            now = time.monotonic()
+            while self.window and now - self.window[0][0] >= self.window_s:
+                self.window.popleft()
+            used_requests = len(self.window)
+            used_tokens = sum(t for _, t in self.window)
+
+            def fits(requests, used):
+                return (not self.rpm or requests + 1 <= self.rpm) and (not self.tpm or used + tokens <= self.tpm)
+
+            retry_after = 0
+            if not fits(used_requests, used_tokens):
+                # Wait until enough of the window has expired for this request to fit
+                retry_after = float(self.window_s)
+                for started, spent in self.window:
+                    used_requests -= 1
+                    used_tokens -= spent
+                    if fits(used_requests, used_tokens):
+                        retry_after = self.window_s - (now - started)
+                        break
+                self.requests["rate_limited"] += 1
+            else:
+                self.window.append((now, tokens))
+                used_requests += 1
+                used_tokens += tokens
+            headers = {}
+            if self.rpm:
+                headers["x-ratelimit-remaining-requests"] = str(max(0, self.rpm - used_requests))
+            if self.tpm:
+                headers["x-ratelimit-remaining-tokens"] = str(max(0, self.tpm - used_tokens))
+            return retry_after, headers
+
+
+def _tool_call(messages):
+    """Pick the tool a real model would likely call for the last user message, if any."""
+    if not messages or messages[-1].get("role") != "user":
+        return None
+    text = (messages[-1].get("content") or "").lower()
+    if any(word in text for word in IMAGE_WORDS):
+        return "generate_image", {"prompt": text}
+    if any(word in text for word in SEARCH_WORDS):
+        return "web_search", {"query": text}
+    return None
+
+
+def make_handler(settings: MockSettings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.limit_headers = {}
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path.endswith("/chat/completions"):
+                self._chat(json.loads(body or b"{}"))
+            elif self.path.startswith("/search"):
+                self._search(json.loads(body or b"{}"))
+            elif self.path.startswith("/hf/"):
+                self._image()
+            else:
+                self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def log_message(self, format, *args):
+            pass
+
+        # === Groq ===
+        def _chat(self, payload):
+            self._count("chat")
+            messages = payload.get("messages", [])
+            prompt_tokens = sum(len(str(m.get("content") or "").split()) for m in messages)
+            words = (ANSWER.split() * (settings.answer_tokens // len(ANSWER.split()) + 1))[:settings.answer_tokens]
+            retry_after, self.limit_headers = settings.admit(prompt_tokens + len(words))
+            if retry_after:
+                # Groq sends whole seconds
+                self.limit_headers["retry-after"] = str(math.ceil(retry_after))
+                self._json(429, {"error": {"message": "Rate limit reached. Please try again later.",
+                                           "type": "requests", "code": "rate_limit_exceeded"}})
+                return
+            time.sleep(settings.llm_ms / 1000)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                     "total_tokens": prompt_tokens + len(words)}
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+            tool = _tool_call(messages) if payload.get("tools") else None
+            if tool and not payload.get("stream"):
+                name, arguments = tool
+                message = {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)},
+                }]}
+                self._json(200, {"id": completion_id, "object": "chat.completion", "model": payload.get("model"),
+                                 "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls"}],
+                                 "usage": usage})
+                return
+
+            if not payload.get("stream"):
+                time.sleep(settings.token_ms * len(words) / 1000)
+                message = {"role": "assistant", "content": " ".join(words)}
+                self._json(200, {"id": completion_id, "object": "chat.completion", "model": payload.get("model"),
+                                 "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                                 "usage": usage})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self._limit_headers()
+            self.end_headers()
+            for i, word in enumerate(words):
+                chunk = {"id": completion_id, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": ("" if i == 0 else " ") + word}}]}
+                self._sse(chunk)
+                time.sleep(settings.token_ms / 1000)
+            self._sse({"id": completion_id, "object": "chat.completion.chunk",
+                       "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                       "x_groq": {"usage": usage}})
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+
+        def _sse(self, data):
+            self._chunk(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+
+        def _chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        # === Serper ===
+        def _search(self, payload):
+            self._count("search")
+            time.sleep(settings.search_ms / 1000)
+            query = payload.get("q", "")
+            self._json(200, {
+                "answerBox": {"snippet": f"Mock answer box for '{query}'."},
+                "organic": [{"title": f"Result {i} for {query}", "link": f"https://example.com/{i}",
+                             "snippet": f"Snippet {i}: details relevant to {query}."} for i in range(5)],
+            })
+
+        # === Hugging Face ===
+        def _image(self):
+            self._count("image")
+            time.sleep(settings.image_ms / 1000)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(PNG_BYTES)))
+            self.end_headers()
+            self.wfile.write(PNG_BYTES)
+
+        def _json(self, status, data):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self._limit_headers()
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _limit_headers(self):
+            for key, value in getattr(self, "limit_headers", {}).items():
+                self.send_header(key, value)
+
+        def _count(self, kind):
+            with settings.lock:
+                settings.requests[kind] += 1
+
+    return Handler
+
+
+def start_mock_server(settings: MockSettings, port: int = 0) -> ThreadingHTTPServer:
+    """Start the mock server on a daemon thread; ``server.server_port`` holds the bound port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(settings))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-servers", daemon=True).start()
+    return server
+
+
+def endpoint_env(port: int) -> dict:
+    """Environment variables that point InsightBot at a mock server on ``port``."""
+    base = f"http://127.0.0.1:{port}"
+    return {
+        "GROQ_API_URL": f"{base}/openai/v1/chat/completions",
+        "SERPER_API_URL": f"{base}/search",
+        "HF_INFERENCE_URL": f"{base}/hf/text-to-image",
+        "GROQ_API_KEY": "mock-groq-key",
+        "SERPER_API_KEY": "mock-serper-key",
+        "HUGGINGFACE_API_KEY": "mock-hf-key",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-ms", type=int, default=300, help="delay before the first byte of a completion")
+    parser.add_argument("--token-ms", type=int, default=15, help="delay between streamed tokens")
+    parser.add_argument("--search-ms", type=int, default=400)
+    parser.add_argument("--image-ms", type=int, default=1500)
+    parser.add_argument("--rpm", type=int, default=0, help="chat requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="chat tokens per minute before 429s (0 = unlimited)")
+    args = parser.parse_args()
+
+    settings = MockSettings(args.llm_ms, args.token_ms, args.search_ms, args.image_ms, rpm=args.rpm, tpm=args.tpm)
+    server = start_mock_server(settings, args.port)
+    print("Mock servers running. Point InsightBot at them with:")
+    for key, value in endpoint_env(server.server_port).items():
+        print(f"  {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
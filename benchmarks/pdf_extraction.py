@@ -0,0 +1,101 @@
+"""PDF extraction benchmark: pages/sec of each installed PDF backend and text agreement with pypdf.
+
+Without --pdf, a synthetic text-heavy PDF is generated (no extra dependencies needed).
+PyMuPDF is only measured when installed (pip install pymupdf).
+
+Usage:
+    python benchmarks/pdf_extraction.py [--pages 200] [--runs 3] [--pdf report.pdf ...]
+"""
+import argparse
+import importlib.util
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from extractors import PDF_BACKENDS, extract_pdf_pymupdf, extract_pdf_pypdf
+
+BACKENDS = {"pypdf": extract_pdf_pypdf, "pymupdf": extract_pdf_pymupdf}
+MODULES = {"pypdf": "pypdf", "pymupdf": "pymupdf"}
+WORDS = ("quarterly revenue forecast vendor security audit roadmap staffing budget incident "
+         "customer retention milestone dependency procurement rollout review").split()
+
+
+def make_pdf(path: str, pages: int, lines_per_page: int = 45):
+    """Write a minimal multi-page PDF with Helvetica text lines and compressed content streams."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [" ".join(WORDS[(page * 7 + line * 3 + i) % len(WORDS)] for i in range(12))
+                 for line in range(lines_per_page)]
+        text = "".join(f"({line}) Tj T* " for line in [f"Page {page + 1}"] + lines)
+        stream = zlib.compress(f"BT /F1 10 Tf 14 TL 50 780 Td {text}ET".encode())
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{k} 0 R" for k in kids).encode(), pages)
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def run(backend: str, path: str):
+    with open(path, "rb") as f:
+        started = time.perf_counter()
+        sections = list(BACKENDS[backend](f))
+        return time.perf_counter() - started, sections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", nargs="*", help="PDF files to extract (default: a generated one)")
+    parser.add_argument("--pages", type=int, default=200, help="pages of the generated PDF")
+    parser.add_argument("--runs", type=int, default=3, help="best of N runs per file")
+    args = parser.parse_args()
+
+    paths = args.pdf
+    if not paths:
+        paths = [os.path.join(tempfile.mkdtemp(), "synthetic.pdf")]
+        make_pdf(paths[0], args.pages)
+
+    backends = [b for b in PDF_BACKENDS if importlib.util.find_spec(MODULES[b]) is not None]
+    missing = sorted(set(PDF_BACKENDS) - set(backends))
+    if missing:
+        print(f"Not installed (skipped): {', '.join(missing)}")
+
+    print(f"{'file':<24}{'backend':<10}{'pages':>7}{'seconds':>10}{'pages/s':>10}{'chars':>10}{'word overlap':>14}")
+    for path in paths:
+        reference = None
+        for backend in sorted(backends, key=lambda b: b != "pypdf"):
+            best, sections = min((run(backend, path) for _ in range(args.runs)), key=lambda r: r[0])
+            text = "\n\n".join(t for t, _ in sections)
+            if reference is None:
+                reference = words(text)
+            # Jaccard overlap of the extracted vocabulary with pypdf's
+            found = words(text)
+            overlap = len(found & reference) / max(1, len(found | reference))
+            print(f"{os.path.basename(path)[:23]:<24}{backend:<10}{len(sections):>7}{best:>10.2f}"
+                  f"{len(sections) / best:>10.0f}{len(text):>10}{overlap:>14.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Rate-limit benchmark: interactive chat and a batch job sharing one Groq quota.
+
+Runs the same mixed workload twice against the local Groq stand-in enforcing a request
+limit: once with only per-request Retry-After retries, once through the process-wide
+rate limiter. Reports 429s received, failed turns, latency and queue wait per priority.
+The limit window is shortened (--window-s) so a "minute" passes in seconds.
+
+Usage:
+    python benchmarks/rate_limit.py [--rpm 20] [--window-s 10] [--users 4] [--turns 3] [--batch 48]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_servers import MockSettings, endpoint_env, start_mock_server
+
+QUESTIONS = ["Summarize the main risks in our projects.", "Explain vendor lock-in in simple terms.",
+             "What should we prioritize next quarter?", "Give me three tips for better status reports."]
+FAILED = ("I'm having trouble connecting", "⚠️")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+async def ask(engine, question, results, kind):
+    messages = [{"role": "user", "content": question}]
+    async for event in engine.run_turn(messages, session_id=kind):
+        if event["type"] == "done":
+            trace = event["trace"]
+            queue_ms = sum(s["duration_ms"] for s in trace["spans"] if s["name"] == "queue_wait")
+            failed = event["content"].startswith(FAILED)
+            results.append((kind, trace["duration_ms"], queue_ms, failed))
+
+
+async def workload(args, results):
+    from chat_engine import ChatEngine
+    from rate_limiter import BULK, INTERACTIVE
+
+    async def user(engine, u):
+        for t in range(args.turns):
+            await ask(engine, QUESTIONS[(u + t) % len(QUESTIONS)], results, "interactive")
+            await asyncio.sleep(args.think_s)
+
+    async with ChatEngine(priority=INTERACTIVE) as chat, ChatEngine(priority=BULK, tools=False) as batch:
+        semaphore = asyncio.Semaphore(args.batch_concurrency)
+
+        async def bulk(i):
+            async with semaphore:
+                await ask(batch, QUESTIONS[i % len(QUESTIONS)], results, "bulk")
+
+        await asyncio.gather(*(bulk(i) for i in range(args.batch)), *(user(chat, u) for u in range(args.users)))
+
+
+def run(args, limited: bool):
+    import config
+    import rate_limiter
+
+    settings = MockSettings(args.llm_ms, args.token_ms, answer_tokens=20, rpm=args.rpm, window_s=args.window_s)
+    server = start_mock_server(settings)
+    os.environ.update(endpoint_env(server.server_port))
+    import chat_engine
+    chat_engine.GROQ_API_URL = os.environ["GROQ_API_URL"]
+
+    config.GROQ_REQUESTS_PER_MINUTE = args.rpm if limited else 0
+    rate_limiter._limiter = rate_limiter.RateLimiter(args.rpm, 0, period=args.window_s) if limited else None
+
+    results = []
+    started = time.perf_counter()
+    asyncio.run(workload(args, results))
+    wall = time.perf_counter() - started
+    server.shutdown()
+
+    label = "rate limiter" if limited else "retry only"
+    print(f"{label}: wall {wall:.1f}s, {settings.requests['chat']} chat requests, "
+          f"{settings.requests['rate_limited']} answered 429")
+    print("  priority      turns  failed   p50 ms   p95 ms   mean queue ms")
+    for kind in ("interactive", "bulk"):
+        rows = [r for r in results if r[0] == kind]
+        latencies = [r[1] for r in rows]
+        print(f"  {kind:<12}{len(rows):>7}{sum(r[3] for r in rows):>8}{percentile(latencies, 0.5):>9.0f}"
+              f"{percentile(latencies, 0.95):>9.0f}{statistics.mean(r[2] for r in rows) if rows else 0:>16.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rpm", type=int, default=20, help="chat requests allowed per window")
+    parser.add_argument("--window-s", type=float, default=10, help="length of the limit window in seconds")
+    parser.add_argument("--users", type=int, default=4, help="interactive users")
+    parser.add_argument("--turns", type=int, default=3, help="turns per interactive user")
+    parser.add_argument("--think-s", type=float, default=1.0, help="pause between a user's turns")
+    parser.add_argument("--batch", type=int, default=48, help="batch questions")
+    parser.add_argument("--batch-concurrency", type=int, default=8)
+    parser.add_argument("--llm-ms", type=int, default=100)
+    parser.add_argument("--token-ms", type=int, default=2)
+    args = parser.parse_args()
+
+    run(args, limited=False)
+    print()
+    run(args, limited=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Reranking benchmark: hit rate / MRR of vector order vs. cross-encoder reranking, and added latency.
+
+Usage:
+    python benchmarks/rerank_eval.py [--k 3] [--candidates 12] [--budget-ms 250]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_community.vectorstores import FAISS
+
+from chunking import StructureAwareSplitter
+from embeddings import get_embeddings
+from reranker import CrossEncoderReranker
+from sample_corpus import build_corpus
+
+
+def reciprocal_rank(docs, answer, source):
+    for rank, doc in enumerate(docs, start=1):
+        if answer in doc.page_content and doc.metadata["source"] == source:
+            return 1 / rank
+    return 0.0
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=12)
+    parser.add_argument("--budget-ms", type=int, default=250)
+    args = parser.parse_args()
+
+    docs, questions = build_corpus()
+    splitter = StructureAwareSplitter()
+    chunks, metadatas = [], []
+    for name, sections in docs:
+        doc_chunks, doc_metadatas = splitter.split_sections(sections)
+        chunks.extend(doc_chunks)
+        metadatas.extend(dict(m, source=name) for m in doc_metadatas)
+    store = FAISS.from_texts(chunks, get_embeddings(), metadatas=metadatas)
+    reranker = CrossEncoderReranker()
+    reranker.warm_up()
+
+    rows = {"vector top-k": ([], []), f"rerank top-{args.candidates}": ([], [])}
+    fallbacks = 0
+    for question, answer, source in questions:
+        t = time.perf_counter()
+        candidates = store.similarity_search(question, k=max(args.k, args.candidates))
+        search_s = time.perf_counter() - t
+        rows["vector top-k"][0].append(reciprocal_rank(candidates[:args.k], answer, source))
+        rows["vector top-k"][1].append(search_s)
+
+        t = time.perf_counter()
+        reranked, used = reranker.rerank(question, candidates, args.k, budget_ms=args.budget_ms)
+        rerank_s = time.perf_counter() - t
+        fallbacks += not used
+        rows[f"rerank top-{args.candidates}"][0].append(reciprocal_rank(reranked, answer, source))
+        rows[f"rerank top-{args.candidates}"][1].append(search_s + rerank_s)
+
+    print(f"{'pipeline':<18}{'hit@' + str(args.k):>8}{'MRR':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, (ranks, latencies) in rows.items():
+        print(f"{name:<18}{sum(r > 0 for r in ranks) / len(ranks):>8.3f}{statistics.mean(ranks):>8.3f}"
+              f"{percentile(latencies, 0.5) * 1000:>9.1f}{percentile(latencies, 0.95) * 1000:>9.1f}")
+    print(f"\nbudget fallbacks: {fallbacks} / {len(questions)} queries (budget {args.budget_ms} ms)")
+
+
+if __name__ == "__main__":
+    main()
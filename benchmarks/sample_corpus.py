@@ -0,0 +1,80 @@
+"""Deterministic synthetic corpus shared by the retrieval benchmarks.
+
+Each document is a list of (text, metadata) sections, like RAGEngine.extract_sections()
+returns, with headings, multi-paragraph sections and a table. Every section hides one
+fact, and each fact comes with a question and the answer string a useful chunk must contain.
+"""
+import random
+
+PROJECTS = ["Atlas", "Borealis", "Cobalt", "Driftwood", "Ember", "Falcon", "Granite", "Helix",
+            "Ironwood", "Juniper", "Kestrel", "Lumen"]
+CITIES = ["Lisbon", "Oslo", "Nairobi", "Osaka", "Denver", "Tallinn", "Recife", "Perth"]
+PEOPLE = ["Amara Obi", "Lena Fischer", "Ravi Menon", "Sofia Duarte", "Tomas Novak", "Yuki Sato",
+          "Grace Mensah", "Omar Haddad"]
+TOPICS = ["Budget", "Staffing", "Timeline", "Risks", "Vendors", "Security Review", "Lessons Learned",
+          "Customer Feedback"]
+FILLER = [
+    "The steering committee reviewed progress against the quarterly plan and noted open items.",
+    "Several dependencies on shared infrastructure were identified during the last planning cycle.",
+    "Teams reported that documentation quality improved after the new review checklist was adopted.",
+    "Stakeholders asked for clearer reporting on milestones that slipped by more than two weeks.",
+    "The change advisory board approved the rollout window after a short discussion.",
+    "Follow-up meetings were scheduled with the regional leads to align on priorities.",
+    "Metrics dashboards were updated to include weekly trend lines and owner annotations.",
+    "A retrospective highlighted communication gaps between engineering and operations.",
+    "Procurement timelines remain the largest source of uncertainty for the next phase.",
+    "The audit trail for configuration changes is now retained for eighteen months.",
+]
+
+
+def _paragraph(rng, sentences):
+    return " ".join(rng.choice(FILLER) for _ in range(sentences))
+
+
+def _fact(rng, project, topic):
+    person, city = rng.choice(PEOPLE), rng.choice(CITIES)
+    amount = f"{rng.randint(2, 98)}.{rng.randint(1, 9)} million"
+    facts = {
+        "Budget": (f"The approved {project} budget for next year is {amount} euros.",
+                   f"What is the approved {project} budget for next year?", amount),
+        "Staffing": (f"{person} was appointed staffing lead for {project}.",
+                     f"Who is the staffing lead for {project}?", person),
+        "Timeline": (f"The {project} go-live was moved to the {city} data center in week {rng.randint(10, 50)}.",
+                     f"Which data center will {project} go live in?", city),
+        "Risks": (f"The top risk for {project} is vendor lock-in with a likelihood of {rng.randint(11, 89)} percent.",
+                  f"What is the top risk for {project}?", "vendor lock-in"),
+        "Vendors": (f"{project} signed a support contract worth {amount} dollars with a vendor in {city}.",
+                    f"How much is the {project} support contract worth?", amount),
+        "Security Review": (f"The {project} security review was signed off by {person}.",
+                            f"Who signed off the {project} security review?", person),
+        "Lessons Learned": (f"The main lesson from {project} was to freeze scope {rng.randint(3, 9)} weeks before launch.",
+                            f"How many weeks before launch should {project} freeze scope?", "weeks before launch"),
+        "Customer Feedback": (f"Customers rated {project} onboarding {rng.randint(61, 97)} out of 100 in {city}.",
+                              f"How did customers rate {project} onboarding?", "out of 100"),
+    }
+    return facts[topic]
+
+
+def build_corpus(seed: int = 7, documents: int = 12):
+    """Return (documents, questions).
+
+    documents: list of (file_name, [(text, metadata), ...]).
+    questions: list of (question, answer_substring, file_name).
+    """
+    rng = random.Random(seed)
+    docs, questions = [], []
+    for d in range(documents):
+        project = PROJECTS[d % len(PROJECTS)]
+        name = f"{project.lower()}_report.docx"
+        sections = []
+        for topic in TOPICS:
+            fact, question, answer = _fact(rng, project, topic)
+            heading = f"{project} {topic}"
+            paragraphs = [_paragraph(rng, rng.randint(2, 6)) for _ in range(rng.randint(1, 5))]
+            paragraphs.insert(rng.randint(0, len(paragraphs)), f"{_paragraph(rng, 1)} {fact}")
+            sections.append(("\n\n".join([heading] + paragraphs), {"heading": heading}))
+            questions.append((question, answer, name))
+        table = "\n".join(f"{p} | {c} | {rng.randint(1, 40)} tickets" for p, c in zip(PEOPLE, CITIES))
+        sections.append((f"{project} Ticket Summary\n\nOwner | City | Open\n{table}", {"heading": f"{project} Ticket Summary"}))
+        docs.append((name, sections))
+    return docs, questions
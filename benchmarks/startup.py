@@ -0,0 +1,74 @@
+"""Startup benchmark: module import cost, model load/warm-up time and first-query latency.
+
+Usage:
+    python benchmarks/startup.py
+"""
+import io
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Modules imported on the first Streamlit script run, plus the heavy ones deferred until needed
+MODULES = ["state", "config", "rag_engine", "image_gen", "ui",
+           "langchain_huggingface", "langchain_community.vectorstores", "pypdf", "docx", "PIL.Image"]
+
+SAMPLE_TEXT = "\n\n".join(
+    f"Section {i}. InsightBot indexes uploaded documents into a FAISS vector store "
+    f"so that questions about topic {i} can be answered from local context." for i in range(200)
+)
+
+
+def time_import(module):
+    """Import a module in a fresh interpreter and return the wall time in milliseconds."""
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+class _SampleUpload(io.BytesIO):
+    """Minimal stand-in for Streamlit's UploadedFile (a BytesIO with a name)."""
+    name = "sample.txt"
+
+
+def main():
+    print("== Import times (fresh interpreter) ==")
+    for module in MODULES:
+        ms = time_import(module)
+        print(f"  {module:<35} {'unavailable' if ms is None else f'{ms:8.1f} ms'}")
+
+    from rag_engine import RAGEngine
+
+    print("\n== Cold start ==")
+    t = time.perf_counter()
+    engine = RAGEngine()
+    print(f"  model load                          {(time.perf_counter() - t) * 1000:8.1f} ms")
+
+    t = time.perf_counter()
+    engine.warm_up()
+    print(f"  warm-up embedding                   {(time.perf_counter() - t) * 1000:8.1f} ms")
+
+    session_data = {"vector_store": None}
+    t = time.perf_counter()
+    vs, msg = engine.process_file(_SampleUpload(SAMPLE_TEXT.encode("utf-8")), session_data)
+    if vs is None:
+        # Query timings against an empty store would be meaningless
+        sys.exit(f"Ingest failed: {msg}")
+    print(f"  first ingest (200 sections)         {(time.perf_counter() - t) * 1000:8.1f} ms")
+
+    t = time.perf_counter()
+    engine.query_docs("What does InsightBot index?", session_data["vector_store"])
+    print(f"  first query                         {(time.perf_counter() - t) * 1000:8.1f} ms")
+
+    t = time.perf_counter()
+    engine.query_docs("Which topic is section 42 about?", session_data["vector_store"])
+    print(f"  second query                        {(time.perf_counter() - t) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
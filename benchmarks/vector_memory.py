@@ -0,0 +1,106 @@
+"""Vector storage benchmark: memory per 10k chunks and recall for float32 FAISS vs. float16 / int8 stores.
+
+Uses random vectors instead of the embedding model so that only storage is measured. Like real
+embeddings they are not isotropic: dimensions have different spreads and some vectors have a
+few large components, which stretch the int8 ranges. Stores are built one document-sized
+batch at a time and merged, as uploads are. recall@k is the overlap of each store's top k
+with the float32 store's.
+
+Usage:
+    python benchmarks/vector_memory.py [--chunks 10000] [--chunk-chars 1000] [--batch 200] [--k 3]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DIM = 384
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Returns pre-generated vectors for the benchmark texts (looked up by position in the text)."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[int(t.split(":", 1)[0])].tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def build(kind, texts, embeddings, metadatas, batch):
+    if kind == "float32":
+        from langchain_community.vectorstores import FAISS
+        make = lambda t, m: FAISS.from_texts(t, embeddings, metadatas=m)
+    else:
+        from vector_store import CompactVectorStore
+        make = lambda t, m: CompactVectorStore.from_texts(t, embeddings, metadatas=m, dtype=kind)
+    store = make(texts[:batch], metadatas[:batch])
+    for start in range(batch, len(texts), batch):
+        store.merge_from(make(texts[start:start + batch], metadatas[start:start + batch]))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=200, help="chunks per simulated upload")
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.chunks, DIM)) * rng.lognormal(0, 0.75, DIM)
+    peaks = rng.random(args.chunks) < 0.3
+    vectors[peaks, rng.integers(0, DIM, peaks.sum())] *= rng.uniform(4, 12, peaks.sum())
+    vectors = vectors.astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    filler = "lorem ipsum dolor sit amet " * (args.chunk_chars // 27 + 1)
+    texts = [f"{i}: {filler[:args.chunk_chars]}" for i in range(args.chunks)]
+    metadatas = [{"source": f"file_{i % 20}.pdf", "page": i % 50} for i in range(args.chunks)]
+    targets = rng.choice(args.chunks, size=args.queries, replace=False)
+    queries = vectors[targets] + 0.05 * rng.standard_normal((args.queries, DIM)).astype(np.float32)
+    embeddings = PrecomputedEmbeddings(vectors)
+    per_10k = 10000 / args.chunks
+
+    reference = None
+    print(f"{'store':<10}{'MB / 10k chunks':>17}{'vectors MB':>12}{'search ms':>11}{'recall@' + str(args.k):>11}")
+    for kind in ("float32", "float16", "int8"):
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        store = build(kind, texts, embeddings, metadatas, args.batch)
+        gc.collect()
+        python_bytes = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        # FAISS keeps its vectors in C++ memory, which tracemalloc cannot see
+        vector_bytes = store.index.ntotal * store.index.sa_code_size()
+        total = python_bytes + vector_bytes
+
+        t = time.perf_counter()
+        found = [{int(doc.page_content.split(":", 1)[0])
+                  for doc, _ in store.similarity_search_with_score_by_vector(query.tolist(), k=args.k)}
+                 for query in queries]
+        search_ms = (time.perf_counter() - t) * 1000 / args.queries
+        reference = reference or found
+        recall = sum(len(a & b) for a, b in zip(found, reference)) / (args.k * args.queries)
+
+        print(f"{kind:<10}{total * per_10k / 2**20:>17.1f}{vector_bytes * per_10k / 2**20:>12.1f}"
+              f"{search_ms:>11.2f}{recall:>11.3f}")
+        del store
+
+
+if __name__ == "__main__":
+    main()
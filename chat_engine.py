@@ -0,0 +1,472 @@
+import asyncio
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+import config
+from cache import make_cache
+from image_gen import generate_image_hf
+from prompts import build_payload, build_system_prompt, clean_messages
+from rate_limiter import INTERACTIVE, estimate_tokens, get_limiter
+from tracing import current_turn, finish_turn, span, start_turn
+
+load_dotenv()
+
+# Endpoints can be pointed at local stand-ins (see benchmarks/mock_servers.py)
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+SERPER_API_KEY = os.getenv("SERPER_API_KEY")
+SERPER_API_URL = os.getenv("SERPER_API_URL", "https://google.serper.dev/search")
+
+IMAGE_DIR = "generated_images"
+
+# Rate limited / temporarily overloaded: worth retrying after a pause
+RETRY_STATUSES = (429, 503)
+
+EMPTY_SEARCH = "The web search returned no relevant results for this query."
+
+# Web search results shared by all engines in the process (or on the host, with SHARED_STATE_DIR)
+_search_cache = make_cache("search_cache", maxsize=256 if config.SEARCH_CACHE_TTL > 0 else 0,
+                           ttl=config.SEARCH_CACHE_TTL)
+
+
+def format_search_results(results: dict) -> str:
+    """Condense a Serper response into the snippets passed back to the model."""
+    output = []
+    # Priority 1: Google's direct answer box
+    if results.get("answerBox"):
+        answer = results["answerBox"].get("answer") or results["answerBox"].get("snippet")
+        if answer:
+            output.append(f"DIRECT ANSWER: {answer}")
+
+    # Priority 2: Knowledge Graph
+    if results.get("knowledgeGraph"):
+        kg = results["knowledgeGraph"]
+        output.append(f"KNOWLEDGE GRAPH: {kg.get('title')} - {kg.get('description')}")
+
+    # Priority 3: Organic snippets
+    for result in results.get("organic", []):
+        title = result.get('title', 'No Title')
+        snippet = result.get('snippet', 'No Snippet')
+        link = result.get('link', 'No Link')
+        output.append(f"🔍 REAL-TIME TRUTH from {title}\nLINK: {link}\nCONTENT: {snippet}")
+
+    return "\n\n---\n\n".join(output[:4]) if output else "No results found."
+
+
+def _is_tool_error(status: int, error: dict) -> bool:
+    """Whether a failed completion can be retried without tools (Groq's failed function calls)."""
+    message = error.get("message", "")
+    return status == 400 and (error.get("code") == "tool_use_failed" or "Failed to call a function" in message)
+
+
+class ChatEngine:
+    """Answers chat turns without any UI: retrieval, tool calls and streaming, as events.
+
+    ``run_turn`` is an async generator of event dicts, each with a ``type``:
+
+        token       {"text"}                  a piece of the streamed answer
+        notice      {"text"}                  informational status (e.g. a retry without tools)
+        tool_start  {"tool", "args"}          a web search or image generation started
+        tool_end    {"tool", "ok", "error"}   ... and finished
+        image       {"path", "prompt"}        a generated image was saved
+        error       {"message"}               a failure shown to the user; the turn still completes
+        message     {"message"}               a message was appended to the conversation
+        done        {"content", "trace"}      the final answer (and the trace, if the engine started it)
+
+    One engine (and its HTTP connection pool) serves any number of concurrent turns on
+    the event loop it was created in.
+    """
+
+    def __init__(self, model: str = None, api_url: str = None, api_key: str = None,
+                 search_url: str = None, search_key: str = None, image_dir: str = IMAGE_DIR,
+                 timeout: float = 30, tools: bool = True, priority: int = INTERACTIVE):
+        self.model = model or GROQ_MODEL
+        self.api_url = api_url or GROQ_API_URL
+        self.api_key = api_key or GROQ_API_KEY
+        self.search_url = search_url or SERPER_API_URL
+        self.search_key = search_key or SERPER_API_KEY
+        self.image_dir = image_dir
+        self.tools = tools
+        # Queue position for rate-limited Groq calls (BULK for batch jobs)
+        self.priority = priority
+        self.client = httpx.AsyncClient(timeout=timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def run_turn(self, messages: List[dict], vector_store=None, session_id: str = "default",
+                       filters: Optional[dict] = None, k: int = 3) -> AsyncIterator[dict]:
+        """Answer the last (user) message, appending tool and assistant messages to ``messages``.
+
+        ``filters`` and ``k`` narrow the document retrieval (see ``RAGEngine.retrieve``).
+        """
+        turn = None
+        if current_turn() is None:
+            turn = start_turn(session_id)
+
+        doc_sources = []
+        try:
+            doc_context = ""
+            if vector_store is not None:
+                doc_sources, doc_context = await self._retrieve(messages[-1]["content"], vector_store, filters, k)
+            payload = build_payload(messages, build_system_prompt(doc_context), self.model, tools=self.tools)
+
+            content = None
+            async for event in self._answer(payload, messages):
+                if event["type"] == "done":
+                    content = event["content"]
+                else:
+                    yield event
+        except Exception as e:
+            yield {"type": "error", "message": f"❌ Processing Error: {e}"}
+            content = "I encountered an error while thinking about your request."
+
+        assistant_msg = {"role": "assistant", "content": content}
+        if doc_sources:
+            # Keep the citation metadata (not the chunk text) so the sources can be shown under the answer
+            assistant_msg["sources"] = [{k: v for k, v in src.items() if k != "text"} for src in doc_sources]
+        messages.append(assistant_msg)
+        yield {"type": "message", "message": assistant_msg}
+        yield {"type": "done", "content": content, "trace": finish_turn(turn) if turn else None}
+
+    async def answer(self, messages: List[dict], vector_store=None, session_id: str = "default",
+                     filters: Optional[dict] = None, k: int = 3) -> str:
+        """Run a turn to completion and return the answer text."""
+        content = ""
+        async for event in self.run_turn(messages, vector_store, session_id, filters, k):
+            if event["type"] == "done":
+                content = event["content"]
+        return content
+
+    # === Stages ===
+    async def _retrieve(self, prompt: str, vector_store, filters: Optional[dict] = None, k: int = 3):
+        from rag_engine import format_context, get_engine
+
+        with span("retrieval") as s:
+            # Loading the engine (cold process), embedding and search are CPU-bound: keep them
+            # off the event loop, which other turns share
+            results = (await asyncio.to_thread(lambda: get_engine().retrieve([prompt], vector_store, k, filters)))[0]
+            context = format_context(results)
+            s["results"] = len(results)
+            s["bytes"] = len(context.encode("utf-8"))
+        return results, context
+
+    async def _answer(self, payload: dict, messages: List[dict]) -> AsyncIterator[dict]:
+        # Step 1: Attempt interaction with potential tool use
+        with span("llm_request", model=payload["model"]) as s:
+            async with self._send(payload, s) as r:
+                s["status"] = r.status_code
+                s["bytes"] = len(r.content)
+                result = r.json() if r.status_code == 200 else None
+                if result:
+                    usage = result.get("usage") or {}
+                    s["prompt_tokens"] = usage.get("prompt_tokens")
+                    s["completion_tokens"] = usage.get("completion_tokens")
+
+        # Step 2: Fall back to plain streaming if the model failed to call a tool
+        if r.status_code != 200:
+            error = _error_body(r)
+            if _is_tool_error(r.status_code, error):
+                fallback_payload = {k: v for k, v in payload.items() if k not in ("tools", "tool_choice")}
+                fallback_payload["stream"] = True
+                yield {"type": "notice", "text": "🔄 Optimizing response path..."}
+                async for event in self._stream(fallback_payload):
+                    yield event
+                return
+            yield {"type": "error", "message": f"🚀 Groq API Error: {error.get('message', '')}"}
+            yield {"type": "done", "content": "I'm having trouble connecting right now. Please try again."}
+            return
+
+        if 'choices' not in result or not result['choices']:
+            yield {"type": "done", "content": "The AI returned an empty response."}
+            return
+
+        message = result['choices'][0]['message']
+        if message.get("tool_calls"):
+            tool_call = message["tool_calls"][0]
+            function_name = tool_call["function"]["name"]
+            function_args = json.loads(tool_call["function"]["arguments"])
+
+            if function_name == "web_search":
+                yield {"type": "tool_start", "tool": function_name, "args": function_args}
+                search_results = await self.search_web(function_args.get("query"))
+                error = search_results if search_results.startswith("Error") else None
+                yield {"type": "tool_end", "tool": function_name, "ok": error is None, "error": error}
+                if not search_results or "No results found" in search_results:
+                    search_results = EMPTY_SEARCH
+
+                # Add the tool call and its results to the conversation, then stream the final answer
+                for msg in (message, {"role": "tool", "tool_call_id": tool_call["id"],
+                                      "name": function_name, "content": search_results}):
+                    messages.append(msg)
+                    yield {"type": "message", "message": msg}
+                final_payload = {
+                    "model": payload["model"],
+                    "messages": [payload["messages"][0], *clean_messages(messages)],  # System prompt first
+                    "stream": True,
+                    "max_tokens": 500
+                }
+                async for event in self._stream(final_payload):
+                    yield event
+                return
+
+            if function_name == "generate_image":
+                image_prompt = function_args.get("prompt")
+                yield {"type": "tool_start", "tool": function_name, "args": function_args}
+                img_path, error = await self.generate_image(image_prompt)
+                yield {"type": "tool_end", "tool": function_name, "ok": error is None, "error": error}
+                if error:
+                    yield {"type": "error", "message": error}
+                    yield {"type": "done",
+                           "content": f"I tried to generate that image, but ran into an issue: {error}"}
+                    return
+                yield {"type": "image", "path": img_path, "prompt": image_prompt}
+
+                # Add the tool results to conversation for history
+                for msg in (message, {"role": "tool", "tool_call_id": tool_call["id"], "name": function_name,
+                                      "content": f"Generated image for: {image_prompt}", "image_path": img_path}):
+                    messages.append(msg)
+                    yield {"type": "message", "message": msg}
+                yield {"type": "done", "content": f"I've generated a visualization for you: **{image_prompt}**"}
+                return
+
+        # The first request already carries the full answer; no need to start a stream
+        content = message.get("content")
+        if content:
+            yield {"type": "token", "text": content}
+            yield {"type": "done", "content": content}
+        else:
+            yield {"type": "done", "content": "I couldn't generate a text response."}
+
+    async def _stream(self, payload: dict) -> AsyncIterator[dict]:
+        response_text = ""
+        try:
+            with span("llm_stream", model=payload["model"]) as s:
+                started = time.perf_counter()
+                async with self._send(payload, s, stream=True) as r:
+                    s["status"] = r.status_code
+                    if r.status_code != 200:
+                        await r.aread()
+                        msg = _error_body(r).get("message")
+                        if msg:
+                            yield {"type": "error", "message": f"Groq API Error ({r.status_code}): {msg}"}
+                            yield {"type": "done", "content": f"⚠️ Error: {msg}"}
+                        else:
+                            yield {"type": "error",
+                                   "message": f"Groq API Error ({r.status_code}): Connection failed."}
+                            yield {"type": "done", "content": f"⚠️ Connection error (Status {r.status_code})."}
+                        return
+
+                    s["bytes"] = 0
+                    s["chunks"] = 0
+                    async for line in r.aiter_lines():
+                        line = line.strip()
+                        if not line:
+                            continue
+                        s["bytes"] += len(line)
+                        if line.startswith("data: "):
+                            line = line[6:]  # Strip "data: "
+                        if line == "[DONE]":
+                            break
+                        try:
+                            data = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        # Groq reports token usage on the final chunk
+                        usage = (data.get("x_groq") or {}).get("usage") or data.get("usage")
+                        if usage:
+                            s["prompt_tokens"] = usage.get("prompt_tokens")
+                            s["completion_tokens"] = usage.get("completion_tokens")
+                        delta = (data.get("choices") or [{}])[0].get("delta", {}).get("content", "")
+                        if delta:
+                            if not response_text:
+                                s["ttft_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                            s["chunks"] += 1
+                            response_text += delta
+                            yield {"type": "token", "text": delta}
+        except Exception as e:
+            yield {"type": "error", "message": f"❌ Streaming Error: {e}"}
+            yield {"type": "done", "content": "Sorry, something went wrong while generating the final response."}
+            return
+
+        if not response_text:
+            response_text = "The AI did not provide an answer. Please try rephrasing."
+        yield {"type": "done", "content": response_text}
+
+    # === Tools ===
+    async def search_web(self, query: str) -> str:
+        """Perform a web search using Serper API."""
+        if not self.search_key or self.search_key == "your_serper_api_key_here":
+            return "Error: Serper API key not configured."
+        headers = {'X-API-KEY': self.search_key, 'Content-Type': 'application/json'}
+        try:
+            with span("web_search", query=query) as s:
+                cached = _search_cache.get(query)
+                s["cache_hit"] = cached is not None
+                if cached is not None:
+                    return cached
+                response = await self.client.post(self.search_url, json={"q": query}, headers=headers, timeout=10)
+                s["status"] = response.status_code
+                s["bytes"] = len(response.content)
+            results = format_search_results(response.json())
+            if response.status_code == 200:
+                _search_cache.set(query, results)
+            return results
+        except Exception as e:
+            return f"Error during search: {e}"
+
+    async def generate_image(self, prompt: str):
+        """Generate and save an image; returns (path, error)."""
+        with span("image_generation", prompt=prompt) as s:
+            # The Hugging Face client is synchronous; run it off the event loop
+            image, error = await asyncio.to_thread(generate_image_hf, prompt)
+            s["ok"] = error is None
+            if error:
+                return None, error
+            os.makedirs(self.image_dir, exist_ok=True)
+            stamp = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
+            # Concurrent turns can finish within the same second
+            img_path = f"{self.image_dir}/img_{stamp}_{uuid.uuid4().hex[:6]}.png"
+            await asyncio.to_thread(image.save, img_path)
+            s["bytes"] = os.path.getsize(img_path)
+        return img_path, None
+
+    @asynccontextmanager
+    async def _send(self, payload: dict, attrs: dict, stream: bool = False):
+        """POST a completion request through the rate limiter, waiting out 429 / 503 responses.
+
+        With a limiter configured, a Retry-After pauses every queued turn, not only this one,
+        and the reserved tokens are settled with the usage the caller records in ``attrs``.
+        """
+        limiter = get_limiter()
+        reserved = estimate_tokens(payload)
+        for attempt in range(config.GROQ_MAX_RETRIES + 1):
+            if limiter is not None:
+                with span("queue_wait", priority=self.priority, tokens=reserved):
+                    attrs["queue_ms"] = attrs.get("queue_ms", 0) + await limiter.acquire(reserved, self.priority)
+            request = self.client.build_request("POST", self.api_url, json=payload, headers=self._headers())
+            r = await self.client.send(request, stream=stream)
+            if limiter is not None:
+                limiter.sync(r.headers)
+            if r.status_code not in RETRY_STATUSES or attempt == config.GROQ_MAX_RETRIES:
+                break
+            await r.aclose()
+            delay = retry_delay(r, attempt)
+            attrs["retries"] = attempt + 1
+            attrs["retry_wait_ms"] = attrs.get("retry_wait_ms", 0) + round(delay * 1000)
+            if limiter is not None:
+                # A rejected request used no tokens; the next attempt queues behind the pause
+                limiter.settle(reserved, 0)
+                limiter.pause(delay)
+            else:
+                await asyncio.sleep(delay)
+        try:
+            yield r
+        finally:
+            await r.aclose()
+            if limiter is not None:
+                used = (attrs.get("prompt_tokens") or 0) + (attrs.get("completion_tokens") or 0)
+                limiter.settle(reserved, used or None)
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+
+def retry_delay(response, attempt: int) -> float:
+    """Seconds to wait before retrying: the server's Retry-After if given, else exponential backoff."""
+    value = response.headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    return min(30.0, 0.5 * 2 ** attempt)
+
+
+def _error_body(response) -> dict:
+    try:
+        return response.json().get("error") or {}
+    except (ValueError, AttributeError):
+        return {}
+
+
+# === Synchronous callers ===
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_engine: Optional[ChatEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_shared_engine():
+    """The process-wide engine and the background event loop it runs on, started on first use.
+
+    Every synchronous turn (all Streamlit sessions) runs on this loop, so they share one
+    HTTP connection pool instead of opening a new client per turn.
+    """
+    global _loop, _engine
+    with _engine_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="chat-engine-loop", daemon=True).start()
+
+            async def _create():
+                return ChatEngine()
+
+            _engine = asyncio.run_coroutine_threadsafe(_create(), loop).result()
+            _loop = loop
+    return _loop, _engine
+
+
+def run_turn_sync(messages: List[dict], vector_store=None, session_id: str = "default",
+                  on_event=None) -> Optional[str]:
+    """Run one turn on the shared engine (for synchronous callers), passing each event to
+    ``on_event`` in the calling thread."""
+    loop, engine = get_shared_engine()
+    events = queue.Queue()
+    # Carry the caller's context vars over (e.g. the turn that main.py is tracing)
+    context = contextvars.copy_context()
+
+    async def _run():
+        for var, value in context.items():
+            var.set(value)
+        try:
+            async for event in engine.run_turn(messages, vector_store, session_id):
+                events.put(event)
+        finally:
+            events.put(None)
+
+    future = asyncio.run_coroutine_threadsafe(_run(), loop)
+    content = None
+    try:
+        for event in iter(events.get, None):
+            if on_event is not None:
+                on_event(event)
+            if event["type"] == "done":
+                content = event["content"]
+        future.result()
+    except BaseException:
+        # The caller was interrupted (e.g. a Streamlit rerun): stop the turn as well
+        future.cancel()
+        raise
+    return content
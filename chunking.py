@@ -0,0 +1,147 @@
+import re
+from typing import Callable, List, Optional, Tuple
+
+import config
+
+# A section is a structural unit of a document (a PDF page, the text under a DOCX
+# heading, ...) with the metadata that should follow its chunks into the index.
+Section = Tuple[str, dict]
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def get_token_counter(model_name: str = None) -> Callable[[List[str]], List[int]]:
+    """Return a batch token counter using the embedding model's tokenizer."""
+    model_name = model_name or config.EMBEDDING_MODEL
+    if "/" not in model_name:
+        model_name = f"sentence-transformers/{model_name}"
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+    except Exception as e:
+        # Offline without a cached tokenizer: ~4 characters per token is close enough for sizing
+        print(f"[InsightBot] Tokenizer unavailable ({e}); estimating token counts from length.")
+        return lambda texts: [max(1, len(t) // 4) for t in texts]
+
+    def count(texts):
+        encoded = tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    return count
+
+
+class StructureAwareSplitter:
+    """Token-sized chunking that follows document structure.
+
+    Small adjacent sections from the same place (page, heading, ...) are packed together and
+    sections are never split across a chunk arbitrarily; long sections are split on
+    paragraph, then sentence, boundaries.
+    Overlap is only carried over when a chunk had to end mid-paragraph; chunks that end
+    on a paragraph or section boundary start clean.
+    """
+
+    def __init__(self, chunk_tokens: int = None, overlap_tokens: int = None,
+                 count_tokens: Optional[Callable[[List[str]], List[int]]] = None):
+        self.chunk_tokens = chunk_tokens or config.CHUNK_TOKENS
+        self.overlap_tokens = overlap_tokens if overlap_tokens is not None else config.CHUNK_OVERLAP_TOKENS
+        self.count_tokens = count_tokens or get_token_counter()
+
+    def split_sections(self, sections: List[Section]) -> Tuple[List[str], List[dict]]:
+        """Split sections into chunks, returning the chunk texts and their metadata."""
+        sections = [(text.strip(), meta) for text, meta in sections if text and text.strip()]
+        if not sections:
+            return [], []
+        sizes = self.count_tokens([text for text, _ in sections])
+
+        chunks, metadatas = [], []
+        packed, packed_meta, packed_size = [], None, 0
+        for (text, meta), size in zip(sections, sizes):
+            if size > self.chunk_tokens:
+                if packed:
+                    chunks.append("\n\n".join(packed))
+                    metadatas.append(packed_meta)
+                    packed, packed_meta, packed_size = [], None, 0
+                for chunk in self._split_long(text, meta.get("heading")):
+                    chunks.append(chunk)
+                    metadatas.append(dict(meta))
+                continue
+            # Only sections with the same metadata (page, heading, ...) are packed together,
+            # so every chunk can be filtered and cited by where its text came from
+            if packed and (packed_size + size > self.chunk_tokens or meta != packed_meta):
+                chunks.append("\n\n".join(packed))
+                metadatas.append(packed_meta)
+                packed, packed_meta, packed_size = [], None, 0
+            packed_meta = packed_meta or dict(meta)
+            packed.append(text)
+            packed_size += size
+        if packed:
+            chunks.append("\n\n".join(packed))
+            metadatas.append(packed_meta)
+        return chunks, metadatas
+
+    def split_text(self, text: str) -> List[str]:
+        return self.split_sections([(text, {})])[0]
+
+    def _split_long(self, text: str, heading: Optional[str]) -> List[str]:
+        # Continuation chunks repeat the section heading so they stay self-describing
+        prefix = f"{heading}\n" if heading and text.startswith(heading) else ""
+        budget = self.chunk_tokens - (self.count_tokens([prefix])[0] if prefix else 0)
+
+        units = self._units(text, budget)
+        unit_sizes = self.count_tokens([u for u, _ in units])
+
+        chunks = []
+        current, current_sizes = [], []
+        for (unit, ends_paragraph), size in zip(units, unit_sizes):
+            if current and sum(current_sizes) + size > budget:
+                chunks.append(self._join(current))
+                # Overlap only when the previous chunk stopped mid-paragraph
+                if current[-1][1]:
+                    current, current_sizes = [], []
+                else:
+                    keep = 0
+                    while keep < len(current) - 1 and not current[-keep - 1][1] \
+                            and sum(current_sizes[len(current) - keep - 1:]) <= self.overlap_tokens:
+                        keep += 1
+                    current, current_sizes = current[len(current) - keep:], current_sizes[len(current_sizes) - keep:]
+                    while current and sum(current_sizes) + size > budget:
+                        current, current_sizes = current[1:], current_sizes[1:]
+            current.append((unit, ends_paragraph))
+            current_sizes.append(size)
+        if current:
+            chunks.append(self._join(current))
+
+        return [chunks[0]] + [chunk if chunk.startswith(prefix) else prefix + chunk for chunk in chunks[1:]]
+
+    def _units(self, text: str, budget: int) -> List[Tuple[str, bool]]:
+        """Break text into (unit, ends_paragraph) pieces no larger than budget tokens."""
+        paragraphs = [p.strip() for p in _PARAGRAPH_BREAK.split(text) if p.strip()]
+        sizes = self.count_tokens(paragraphs)
+        units = []
+        for paragraph, size in zip(paragraphs, sizes):
+            if size <= budget:
+                units.append((paragraph, True))
+                continue
+            sentences = [s for s in _SENTENCE_END.split(paragraph) if s]
+            sentence_sizes = self.count_tokens(sentences)
+            pieces = []
+            for sentence, sentence_size in zip(sentences, sentence_sizes):
+                if sentence_size <= budget:
+                    pieces.append(sentence)
+                    continue
+                # A single overlong sentence: fall back to fixed word windows
+                words = sentence.split()
+                step = max(1, len(words) * budget // sentence_size)
+                pieces.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+            units.extend((piece, i == len(pieces) - 1) for i, piece in enumerate(pieces))
+        return units
+
+    @staticmethod
+    def _join(units: List[Tuple[str, bool]]) -> str:
+        out = ""
+        for i, (unit, _) in enumerate(units):
+            if i:
+                out += "\n\n" if units[i - 1][1] else " "
+            out += unit
+        return out
@@ -0,0 +1,104 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+# === Startup ===
+# Load and warm the embedding model in a background thread as soon as the app boots
+WARMUP_ON_START = _env_bool("INSIGHTBOT_WARMUP", True)
+
+# === Embeddings ===
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# "torch" (default), "onnx" or "onnx-int8" (quantized, CPU-only hosts)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_BATCH_SIZE = _env_int("EMBEDDING_BATCH_SIZE", 32)
+# Intra-op threads for torch / ONNX Runtime; 0 keeps the library default
+EMBEDDING_THREADS = _env_int("EMBEDDING_THREADS", 0)
+# Override the ONNX file inside the model repo (e.g. onnx/model_qint8_arm64.onnx on ARM hosts)
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+# Embed in a pool of worker processes shared by all sessions (0 = embed in-process)
+EMBEDDING_WORKERS = _env_int("EMBEDDING_WORKERS", 0)
+# Micro-batching: pack queued requests into batches of up to N texts, waiting at most N ms
+EMBEDDING_MAX_BATCH = _env_int("EMBEDDING_MAX_BATCH", 64)
+EMBEDDING_MAX_WAIT_MS = _env_int("EMBEDDING_MAX_WAIT_MS", 10)
+# host:port of a standalone embedding server (python embedding_service.py) shared by every
+# Streamlit process on the host, so none of them loads the model itself (empty = disabled)
+EMBEDDING_SERVICE_ADDRESS = os.getenv("EMBEDDING_SERVICE_ADDRESS", "")
+# Shared secret of the embedding server. There is no default: when empty, the server writes a
+# random key to SHARED_STATE_DIR/embedding_service.key (mode 0600) and clients read it from there
+EMBEDDING_SERVICE_KEY = os.getenv("EMBEDDING_SERVICE_KEY", "")
+
+# === Vector Storage ===
+# "float32" keeps LangChain's FAISS store; "float16" / "int8" use the compact quantized store
+VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")
+# Compact stores: candidates (k * N) fetched per round when a metadata filter is set
+VECTOR_RESCORE_FACTOR = _env_int("VECTOR_RESCORE_FACTOR", 4)
+
+# === Document Extraction ===
+# "auto" uses PyMuPDF when installed (much faster), otherwise pypdf; or force "pymupdf" / "pypdf"
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto")
+# CSV / XLSX rows rendered into one section before chunking
+TABLE_ROWS_PER_SECTION = _env_int("TABLE_ROWS_PER_SECTION", 50)
+
+# === Chunking ===
+# "structure" (token-sized, heading/page aware) or "recursive" (fixed 1000-character chunks)
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "structure")
+# all-MiniLM-L6-v2 truncates input after 256 word pieces, so chunks must stay below that
+CHUNK_TOKENS = _env_int("CHUNK_TOKENS", 240)
+CHUNK_OVERLAP_TOKENS = _env_int("CHUNK_OVERLAP_TOKENS", 24)
+# Text files are decoded, split and embedded in windows of this many characters, so memory
+# stays flat regardless of file size
+INGEST_WINDOW_CHARS = _env_int("INGEST_WINDOW_CHARS", 1_000_000)
+
+# === Reranking ===
+# Over-fetch candidates from the vector store and reorder them with a local cross-encoder
+RERANK_ENABLED = _env_bool("RERANK_ENABLED", False)
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = _env_int("RERANK_CANDIDATES", 12)
+RERANK_BATCH_SIZE = _env_int("RERANK_BATCH_SIZE", 16)
+# Time allowed for reranking one query; past it, results keep the vector order
+RERANK_BUDGET_MS = _env_int("RERANK_BUDGET_MS", 250)
+
+# === Caching ===
+# SQLite file that persists document and query embeddings across runs (empty = disabled)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+# Retrieval results kept per process, keyed by index, query, k and filters (0 = disabled)
+RETRIEVAL_CACHE_SIZE = _env_int("RETRIEVAL_CACHE_SIZE", 256)
+# Seconds a web search result is reused for the same query (0 = disabled)
+SEARCH_CACHE_TTL = _env_int("SEARCH_CACHE_TTL", 600)
+
+# === Shared State ===
+# Directory shared by several Streamlit processes on one host: sessions (SQLite), session
+# indexes (memory-mapped FAISS files) and the embedding / search caches live here, so any
+# process can serve any session. Empty = sessions live in each process's memory only.
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", "")
+
+# === LLM API ===
+# Retries of rate-limited (429) or overloaded (503) Groq calls, honoring Retry-After
+GROQ_MAX_RETRIES = _env_int("GROQ_MAX_RETRIES", 3)
+# Client-side limits shared by every session in the process (0 = unlimited); Groq's free
+# tier allows e.g. 30 requests and 6000 tokens per minute for llama-3.1-8b-instant
+GROQ_REQUESTS_PER_MINUTE = _env_int("GROQ_REQUESTS_PER_MINUTE", 0)
+GROQ_TOKENS_PER_MINUTE = _env_int("GROQ_TOKENS_PER_MINUTE", 0)
+
+# === Tracing ===
+# Append one JSON line per chat turn with per-stage spans (empty = disabled)
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "")
+# Serve aggregated stage metrics in Prometheus text format on localhost:PORT/metrics (0 = disabled)
+TRACE_PROMETHEUS_PORT = _env_int("TRACE_PROMETHEUS_PORT", 0)
+# Show the last turn's stage timings in the sidebar
+TRACE_DEBUG_PANEL = _env_bool("TRACE_DEBUG_PANEL", False)
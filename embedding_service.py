@@ -0,0 +1,270 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.managers import BaseManager
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+import config
+
+# Request priorities: interactive queries jump ahead of bulk document uploads
+INTERACTIVE = 0
+BULK = 1
+
+_SHUTDOWN = object()
+
+
+# === Worker process side ===
+_worker_embedder = None
+
+
+def _init_worker(backend, batch_size, threads):
+    global _worker_embedder
+    from embeddings import get_embeddings
+    _worker_embedder = get_embeddings(backend, batch_size=batch_size, threads=threads)
+    _worker_embedder.embed_query("warm-up")
+
+
+def _embed_batch(texts):
+    return _worker_embedder.embed_documents(texts)
+
+
+# === Server process side ===
+class EmbeddingService:
+    """A pool of embedding worker processes fed by a micro-batching request queue.
+
+    Requests from every session are queued, packed into batches of up to ``max_batch``
+    texts (waiting at most ``max_wait_ms`` for a batch to fill) and dispatched to the
+    next free worker, so uploads and queries no longer embed on the Streamlit script thread.
+    """
+
+    def __init__(self, workers: int, max_batch: int = 64, max_wait_ms: int = 10,
+                 backend: str = None, batch_size: int = None, threads: int = None):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(backend or config.EMBEDDING_BACKEND,
+                      batch_size or config.EMBEDDING_BATCH_SIZE,
+                      threads if threads is not None else config.EMBEDDING_THREADS),
+        )
+        # Two batches per worker in flight keeps every worker busy; beyond that requests
+        # wait in the queue, where they can still be merged into larger batches.
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0, "queue_wait_s": 0.0}
+        self._batcher = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._batcher.start()
+
+    def embed(self, texts: List[str], priority: int = BULK) -> List[List[float]]:
+        """Embed texts through the worker pool, blocking until all vectors are ready."""
+        if not texts:
+            return []
+        # Large uploads are split so their pieces spread across workers and interleave with queries
+        futures = []
+        for start in range(0, len(texts), self.max_batch):
+            future = Future()
+            piece = list(texts[start:start + self.max_batch])
+            self._queue.put((priority, next(self._sequence), piece, future, time.monotonic()))
+            futures.append(future)
+        with self._stats_lock:
+            self._stats["requests"] += 1
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def shutdown(self):
+        self._queue.put((-1, -1, _SHUTDOWN, None, 0.0))
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item[2] is _SHUTDOWN:
+                return
+            batch, size = [item], len(item[2])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item[2] is _SHUTDOWN or size + len(item[2]) > self.max_batch:
+                    # Doesn't fit: put it back for the next batch
+                    self._queue.put(item)
+                    break
+                batch.append(item)
+                size += len(item[2])
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        self._slots.acquire()
+        now = time.monotonic()
+        texts = [text for item in batch for text in item[2]]
+        with self._stats_lock:
+            self._stats["texts"] += len(texts)
+            self._stats["batches"] += 1
+            self._stats["queue_wait_s"] += sum(now - item[4] for item in batch)
+        try:
+            pool_future = self._pool.submit(_embed_batch, texts)
+        except Exception as e:
+            self._slots.release()
+            for item in batch:
+                item[3].set_exception(e)
+            return
+        pool_future.add_done_callback(lambda f: self._complete(batch, f))
+
+    def _complete(self, batch, pool_future):
+        self._slots.release()
+        error = pool_future.exception()
+        if error is not None:
+            for item in batch:
+                item[3].set_exception(error)
+            return
+        vectors = pool_future.result()
+        offset = 0
+        for item in batch:
+            item[3].set_result(vectors[offset:offset + len(item[2])])
+            offset += len(item[2])
+
+
+class RemoteEmbeddings(Embeddings):
+    """LangChain embeddings adapter that routes calls through the shared EmbeddingService."""
+
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.service.embed(texts, priority=BULK)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.service.embed([text], priority=INTERACTIVE)[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.service.embed(texts, priority=INTERACTIVE)
+
+
+# === Process-wide service ===
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> EmbeddingService:
+    """Return the process-wide EmbeddingService, starting its workers on first use.
+
+    With EMBEDDING_SERVICE_ADDRESS set this is a proxy to the standalone server instead
+    (raises OSError if it isn't running).
+    """
+    global _service
+    with _service_lock:
+        if _service is None and config.EMBEDDING_SERVICE_ADDRESS:
+            _service = connect(config.EMBEDDING_SERVICE_ADDRESS)
+        elif _service is None:
+            _service = EmbeddingService(
+                workers=config.EMBEDDING_WORKERS,
+                max_batch=config.EMBEDDING_MAX_BATCH,
+                max_wait_ms=config.EMBEDDING_MAX_WAIT_MS,
+            )
+            atexit.register(_service.shutdown)
+    return _service
+
+
+# === Standalone server shared by several processes ===
+class _ServiceManager(BaseManager):
+    pass
+
+
+KEY_FILE = "embedding_service.key"
+
+
+def _authkey(create: bool = False) -> bytes:
+    """Secret that the server and its clients authenticate with.
+
+    The manager protocol exchanges pickles, so anyone who knows the key can run code in the
+    server: there is no default. It is EMBEDDING_SERVICE_KEY, or else a random key kept in
+    SHARED_STATE_DIR that only the service user can read (created by the server with ``create``).
+    """
+    if config.EMBEDDING_SERVICE_KEY:
+        return config.EMBEDDING_SERVICE_KEY.encode()
+    if not config.SHARED_STATE_DIR:
+        raise PermissionError("The embedding service needs EMBEDDING_SERVICE_KEY or SHARED_STATE_DIR for its key")
+    path = os.path.join(config.SHARED_STATE_DIR, KEY_FILE)
+    if create:
+        os.makedirs(config.SHARED_STATE_DIR, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    if os.stat(path).st_mode & 0o077:
+        raise PermissionError(f"{path} must only be readable by its owner (chmod 600)")
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip().encode()
+
+
+def _parse_address(address: str):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def serve(address: str, workers: int):
+    """Run an EmbeddingService that every Streamlit process on the host can connect to."""
+    authkey = _authkey(create=True)
+    service = EmbeddingService(workers=workers, max_batch=config.EMBEDDING_MAX_BATCH,
+                               max_wait_ms=config.EMBEDDING_MAX_WAIT_MS)
+    _ServiceManager.register("get_service", callable=lambda: service, exposed=("embed", "stats"))
+    manager = _ServiceManager(address=_parse_address(address), authkey=authkey)
+    print(f"[InsightBot] Embedding service with {workers} workers listening on {address}")
+    try:
+        manager.get_server().serve_forever()
+    finally:
+        service.shutdown()
+
+
+def connect(address: str):
+    """Proxy to a running ``serve``; it exposes ``embed`` and ``stats`` like EmbeddingService.
+    Proxies open one connection per calling thread, so they can be shared by sessions."""
+    _ServiceManager.register("get_service")
+    manager = _ServiceManager(address=_parse_address(address), authkey=_authkey())
+    try:
+        manager.connect()
+    except multiprocessing.AuthenticationError as e:
+        raise PermissionError(f"the embedding service at {address} rejected the key ({e})") from e
+    return manager.get_service()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve embeddings to every InsightBot process on this host.")
+    parser.add_argument("--address", default=config.EMBEDDING_SERVICE_ADDRESS or "127.0.0.1:50051")
+    parser.add_argument("--workers", type=int, default=config.EMBEDDING_WORKERS or 2)
+    args = parser.parse_args()
+    try:
+        serve(args.address, args.workers)
+    except PermissionError as e:
+        parser.error(str(e))
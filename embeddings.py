@@ -0,0 +1,144 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+import config
+
+# ONNX exports shipped in the sentence-transformers/all-MiniLM-L6-v2 model repository
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_qint8_avx512.onnx",
+}
+
+BACKENDS = ("torch",) + tuple(ONNX_FILES)
+
+
+def get_embeddings(backend: str = None, batch_size: int = None, threads: int = None):
+    """Build a LangChain embeddings object for the configured backend.
+
+    "torch" is the original PyTorch model; "onnx" runs the same weights on ONNX Runtime
+    and "onnx-int8" uses the dynamically quantized int8 export (CPU-only hosts).
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    backend = backend or config.EMBEDDING_BACKEND
+    batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+    threads = threads if threads is not None else config.EMBEDDING_THREADS
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+    model_kwargs = {"device": "cpu"}
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+    else:
+        # Requires: pip install "sentence-transformers[onnx]"
+        import onnxruntime
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+        model_kwargs["backend"] = "onnx"
+        model_kwargs["model_kwargs"] = {
+            "file_name": config.EMBEDDING_ONNX_FILE or ONNX_FILES[backend],
+            "provider": "CPUExecutionProvider",
+            "session_options": session_options,
+        }
+
+    return HuggingFaceEmbeddings(
+        model_name=config.EMBEDDING_MODEL,
+        model_kwargs=model_kwargs,
+        encode_kwargs={"batch_size": batch_size},
+    )
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed a batch of search queries in one call, at interactive priority where there is one.
+
+    Embeddings without a batched query call (``embed_queries``) embed them as documents:
+    all-MiniLM-L6-v2 embeds queries and documents alike.
+    """
+    batched = getattr(embeddings, "embed_queries", None)
+    return batched(texts) if batched is not None else embeddings.embed_documents(texts)
+
+
+class CachedEmbeddings(Embeddings):
+    """Persists embeddings in a SQLite file keyed by model and text hash.
+
+    Re-ingesting a document (or asking the same question again) reuses the stored vectors
+    and only the texts never seen before are sent to the underlying model, in one batch.
+    """
+
+    def __init__(self, underlying: Embeddings, path: str, namespace: str):
+        self.underlying = underlying
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared by the Streamlit and worker threads; writes are serialized by the lock.
+        # Other processes may use the same file (SHARED_STATE_DIR): wait for their writes
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self._lock = threading.Lock()
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def _store(self, items: List[tuple]):
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                                 [(key, array("f", vector).tobytes()) for key, vector in items])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed("doc", texts, self.underlying.embed_documents)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Batched ``embed_query``: shares its cache entries and passes the misses on in one call."""
+        return self._embed("query", texts, lambda missing: embed_queries(self.underlying, missing))
+
+    def _embed(self, kind: str, texts: List[str], compute) -> List[List[float]]:
+        keys = [self._key(kind, text) for text in texts]
+        found = self._lookup(list(set(keys)))
+        misses = [key for key in keys if key not in found]
+        self.hits += len(keys) - len(misses)
+        self.misses += len(misses)
+        # Duplicate texts in one call are embedded once
+        missing = list(dict.fromkeys(misses))
+        if missing:
+            texts_by_key = dict(zip(keys, texts))
+            vectors = compute([texts_by_key[key] for key in missing])
+            self._store(list(zip(missing, vectors)))
+            found.update(zip(missing, vectors))
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        found = self._lookup([key])
+        if key in found:
+            self.hits += 1
+            return found[key]
+        self.misses += 1
+        vector = self.underlying.embed_query(text)
+        self._store([(key, vector)])
+        return vector
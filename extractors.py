@@ -0,0 +1,345 @@
+import codecs
+import csv
+import importlib.util
+import io
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import config
+from chunking import Section
+
+# Format handlers keyed by file extension. Each handler takes an open binary file (a
+# Streamlit upload or a file opened from disk) and yields (text, metadata) sections as it
+# reads, so large documents never have to be held as one string. Parsing libraries are
+# imported inside the handlers to keep this module cheap to import at startup.
+EXTRACTORS: Dict[str, Callable[[object], Iterator[Section]]] = {}
+_REQUIRES: Dict[str, Optional[str]] = {}
+
+_MARKDOWN_HEADING = re.compile(r"^ {0,3}#{1,6}\s+(.*?)\s*#*\s*$")
+
+
+def register(*extensions: str, requires: Optional[str] = None):
+    """Register a handler for ``extensions``; ``requires`` names the module it needs installed."""
+    def decorator(handler):
+        for extension in extensions:
+            EXTRACTORS[extension] = handler
+            _REQUIRES[extension] = requires
+        return handler
+    return decorator
+
+
+def extension_of(name: str) -> str:
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+def supported_extensions() -> Tuple[str, ...]:
+    """Extensions that have a handler whose dependencies are installed."""
+    return tuple(ext for ext, module in _REQUIRES.items()
+                 if module is None or importlib.util.find_spec(module) is not None)
+
+
+def extract(uploaded_file) -> Iterator[Section]:
+    """Stream the sections of a document with the handler registered for its extension."""
+    extension = extension_of(uploaded_file.name)
+    if extension not in EXTRACTORS:
+        raise ValueError(f"Unsupported file type: {extension}")
+    return EXTRACTORS[extension](uploaded_file)
+
+
+@contextmanager
+def file_buffer(uploaded_file):
+    """Zero-copy read-only view of a file's bytes: the in-memory buffer of an upload, or a
+    memory map of a file on disk."""
+    if hasattr(uploaded_file, "getbuffer"):
+        with uploaded_file.getbuffer() as view:
+            yield view
+        return
+    if os.fstat(uploaded_file.fileno()).st_size == 0:
+        yield memoryview(b"")
+        return
+    with mmap.mmap(uploaded_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as view:
+            yield view
+
+
+def iter_decoded(uploaded_file, errors: str = "strict", read_bytes: int = 1 << 20) -> Iterator[str]:
+    """Decode a file as UTF-8 piece by piece, without copying the whole file."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors)
+    with file_buffer(uploaded_file) as view:
+        for position in range(0, len(view), read_bytes):
+            yield decoder.decode(view[position:position + read_bytes])
+    yield decoder.decode(b"", final=True)
+
+
+def iter_text_windows(pieces: Iterator[str], window_chars: int) -> Iterator[str]:
+    """Re-cut decoded text into windows of at most about ``window_chars``.
+
+    Windows end on a paragraph break, which is dropped, so joining the windows with blank
+    lines restores the text; only a paragraph longer than a window is cut at a line break
+    (or anywhere).
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= window_chars:
+            cut = buffer.rfind("\n\n", 0, window_chars)
+            if cut > 0:
+                yield buffer[:cut]
+                buffer = buffer[cut + 2:]
+                continue
+            cut = buffer.rfind("\n", 0, window_chars) + 1 or window_chars
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    if buffer:
+        yield buffer
+
+
+@register("txt")
+def extract_txt(uploaded_file) -> Iterator[Section]:
+    for text in iter_text_windows(iter_decoded(uploaded_file), config.INGEST_WINDOW_CHARS):
+        yield text, {}
+
+
+@register("md", "markdown")
+def extract_markdown(uploaded_file) -> Iterator[Section]:
+    """One section per heading; a very long section is flushed at a blank line."""
+    heading, lines, size, in_code = None, [], 0, False
+    for text in iter_text_windows(iter_decoded(uploaded_file), config.INGEST_WINDOW_CHARS):
+        # Windows end where a blank line was dropped
+        for line in text.split("\n") + [""]:
+            if line.lstrip().startswith(("```", "~~~")):
+                in_code = not in_code
+            match = None if in_code else _MARKDOWN_HEADING.match(line)
+            if match or (size > config.INGEST_WINDOW_CHARS and not line.strip()):
+                if any(l.strip() for l in lines):
+                    yield "\n".join(lines).strip(), {"heading": heading} if heading else {}
+                lines, size = [], 0
+                if match:
+                    heading = match.group(1)
+            lines.append(line)
+            size += len(line) + 1
+    if any(l.strip() for l in lines):
+        yield "\n".join(lines).strip(), {"heading": heading} if heading else {}
+
+
+class _HTMLSections(HTMLParser):
+    """Collects visible text, starting a new section at every h1-h6."""
+
+    SKIP = {"script", "style", "noscript", "template", "head"}
+    BLOCKS = {"p", "div", "section", "article", "li", "tr", "br", "pre", "blockquote", "table",
+              "ul", "ol", "dl", "dt", "dd", "header", "footer", "main", "nav", "aside", "figure"}
+    HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections: List[Section] = []
+        self._parts, self._heading, self._title = [], None, None
+        self._skip, self._size = 0, 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag in self.HEADINGS:
+            self.flush()
+            self._title = []
+        elif tag in self.BLOCKS:
+            self._parts.append("\n")
+        elif tag in ("td", "th"):
+            self._parts.append(" | ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.HEADINGS and self._title is not None:
+            self._heading = " ".join("".join(self._title).split()) or None
+            self._parts.append("\n")
+            self._title = None
+        elif tag in self.BLOCKS:
+            self._parts.append("\n")
+            # A long page without headings is still emitted in bounded pieces
+            if self._size > config.INGEST_WINDOW_CHARS:
+                self.flush()
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self._parts.append(data)
+        self._size += len(data)
+        if self._title is not None:
+            self._title.append(data)
+
+    def flush(self):
+        lines = (" ".join(line.split()) for line in "".join(self._parts).split("\n"))
+        text = "\n".join(line.strip(" |") for line in lines if line.strip(" |"))
+        if text:
+            self.sections.append((text, {"heading": self._heading} if self._heading else {}))
+        self._parts, self._size = [], 0
+
+
+@register("html", "htm")
+def extract_html(uploaded_file) -> Iterator[Section]:
+    parser = _HTMLSections()
+    for piece in iter_decoded(uploaded_file, errors="replace"):
+        parser.feed(piece)
+        yield from parser.sections
+        parser.sections = []
+    parser.close()
+    parser.flush()
+    yield from parser.sections
+
+
+def _row_batches(rows: Iterator[list], metadata: dict) -> Iterator[Section]:
+    """Render table rows as "column: value" lines, TABLE_ROWS_PER_SECTION rows per section,
+    so every chunk carries its column names."""
+    header, batch, first = None, [], None
+    for number, row in enumerate(rows, start=1):
+        cells = ["" if value is None else " ".join(str(value).split()) for value in row]
+        if not any(cells):
+            continue
+        if header is None:
+            header = [cell or f"column {i + 1}" for i, cell in enumerate(cells)]
+            continue
+        first = first or number
+        names = header + [f"column {i + 1}" for i in range(len(header), len(cells))]
+        batch.append("; ".join(f"{name}: {cell}" for name, cell in zip(names, cells) if cell))
+        if len(batch) >= config.TABLE_ROWS_PER_SECTION:
+            yield "\n".join(batch), dict(metadata, rows=f"{first}-{number}")
+            batch, first = [], None
+    if batch:
+        yield "\n".join(batch), dict(metadata, rows=f"{first}-{number}")
+
+
+@register("csv")
+def extract_csv(uploaded_file) -> Iterator[Section]:
+    text = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        yield from _row_batches(csv.reader(text), {})
+    finally:
+        # Don't let the wrapper close the caller's file
+        text.detach()
+
+
+@register("xlsx", requires="openpyxl")
+def extract_xlsx(uploaded_file) -> Iterator[Section]:
+    from openpyxl import load_workbook
+    # read_only streams rows instead of loading every cell; data_only gives computed values
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield from _row_batches(sheet.iter_rows(values_only=True), {"sheet": sheet.title})
+    finally:
+        workbook.close()
+
+
+def _table_lines(table) -> List[str]:
+    lines = []
+    for row in table.rows:
+        cells = []
+        for cell in row.cells:
+            text = " ".join(cell.text.split())
+            # Merged cells repeat in every row/column they span
+            if text and (not cells or cells[-1] != text):
+                cells.append(text)
+        if cells:
+            lines.append(" | ".join(cells))
+    return lines
+
+
+@register("pptx", requires="pptx")
+def extract_pptx(uploaded_file) -> Iterator[Section]:
+    """One section per slide: title, text boxes, tables and speaker notes."""
+    from pptx import Presentation
+    from pptx.enum.shapes import MSO_SHAPE_TYPE
+
+    def shape_lines(shapes):
+        for shape in shapes:
+            if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+                yield from shape_lines(shape.shapes)
+            elif getattr(shape, "has_table", False) and shape.has_table:
+                yield from _table_lines(shape.table)
+            elif getattr(shape, "has_text_frame", False) and shape.has_text_frame:
+                for paragraph in shape.text_frame.paragraphs:
+                    text = "".join(run.text for run in paragraph.runs).strip()
+                    if text:
+                        yield text
+
+    for number, slide in enumerate(Presentation(uploaded_file).slides, start=1):
+        lines = list(shape_lines(slide.shapes))
+        if slide.has_notes_slide and slide.notes_slide.notes_text_frame is not None:
+            notes = slide.notes_slide.notes_text_frame.text.strip()
+            if notes:
+                lines.append(f"Notes: {notes}")
+        metadata = {"slide": number}
+        title = slide.shapes.title
+        if title is not None and title.has_text_frame and title.text_frame.text.strip():
+            metadata["heading"] = " ".join(title.text_frame.text.split())
+        if lines:
+            yield "\n".join(lines), metadata
+
+
+@register("docx")
+def extract_docx(uploaded_file) -> Iterator[Section]:
+    """One section per heading; tables are kept in document order as "cell | cell" rows."""
+    from docx import Document
+    from docx.table import Table
+
+    heading, lines = None, []
+    for block in Document(uploaded_file).iter_inner_content():
+        if isinstance(block, Table):
+            table = _table_lines(block)
+            if table:
+                lines.append("\n".join(table))
+            continue
+        style = block.style.name if block.style is not None else ""
+        if style.startswith("Heading") or style == "Title":
+            if lines:
+                yield "\n\n".join(lines), {"heading": heading} if heading else {}
+            heading, lines = block.text.strip(), [block.text.strip()]
+        elif block.text.strip():
+            lines.append(block.text)
+    if lines:
+        yield "\n\n".join(lines), {"heading": heading} if heading else {}
+
+
+PDF_BACKENDS = ("pymupdf", "pypdf")
+
+
+def pdf_backend() -> str:
+    """The configured PDF_BACKEND; "auto" prefers PyMuPDF when it is installed."""
+    if config.PDF_BACKEND != "auto":
+        return config.PDF_BACKEND
+    return "pymupdf" if importlib.util.find_spec("pymupdf") is not None else "pypdf"
+
+
+def extract_pdf_pypdf(uploaded_file) -> Iterator[Section]:
+    from pypdf import PdfReader
+    for number, page in enumerate(PdfReader(uploaded_file).pages, start=1):
+        yield page.extract_text() or "", {"page": number}
+
+
+def extract_pdf_pymupdf(uploaded_file) -> Iterator[Section]:
+    # Requires: pip install pymupdf (MuPDF's C text extraction, several times faster than pypdf)
+    import pymupdf
+    # Uploads are opened from their in-memory buffer, files on disk by path
+    if hasattr(uploaded_file, "getbuffer"):
+        document = pymupdf.open(stream=uploaded_file, filetype="pdf")
+    else:
+        document = pymupdf.open(uploaded_file.name, filetype="pdf")
+    with document:
+        for number, page in enumerate(document, start=1):
+            yield page.get_text(), {"page": number}
+
+
+@register("pdf")
+def extract_pdf(uploaded_file) -> Iterator[Section]:
+    """One section per page, with the backend chosen by PDF_BACKEND."""
+    backend = pdf_backend()
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {backend} (expected auto or one of {', '.join(PDF_BACKENDS)})")
+    if backend == "pymupdf":
+        return extract_pdf_pymupdf(uploaded_file)
+    return extract_pdf_pypdf(uploaded_file)
@@ -1,15 +1,13 @@
 import os
-import io
-import streamlit as st
-from PIL import Image
 from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
 
 load_dotenv()
 
 HF_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
 # Using the newer FLUX model which is optimized for the new router
 MODEL_ID = "black-forest-labs/FLUX.1-schnell"
+# Optional full endpoint URL (e.g. a local stand-in) used instead of the hosted model
+HF_INFERENCE_URL = os.getenv("HF_INFERENCE_URL")
 
 def generate_image_hf(prompt):
     """Generate an image using Hugging Face InferenceClient."""
@@ -17,13 +15,16 @@ def generate_image_hf(prompt):
         return None, "Hugging Face API Key is missing. Please add HUGGINGFACE_API_KEY to your .env file."
 
     try:
+        # Imported lazily: huggingface_hub (and PIL behind it) is only needed when an image is requested
+        from huggingface_hub import InferenceClient
+
         # InferenceClient automatically handles the correct endpoint (api-inference or router)
         client = InferenceClient(token=HF_API_KEY)
         
         # Standard text-to-image call
         image = client.text_to_image(
             prompt,
-            model=MODEL_ID
+            model=HF_INFERENCE_URL or MODEL_ID
         )
         
         if image:
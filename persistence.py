@@ -0,0 +1,225 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import uuid
+import zipfile
+from typing import BinaryIO, Callable, List, Optional
+
+import config
+
+# Session fields that are not stored in the JSON row: the index is saved as files
+_NOT_STORED = ("vector_store", "revision", "index")
+
+ARCHIVE_FORMAT = "insightbot-session"
+ARCHIVE_VERSION = 1
+# Session fields kept in an archive's manifest (messages and the index have their own entries)
+_ARCHIVED_FIELDS = ("uploaded_files", "pending_files", "documents")
+# scales.f32 is only in archives of int8 stores with per-vector scales (see vector_store.load_store)
+_INDEX_FILES = ("store.json", "index.faiss", "chunks.jsonl", "scales.f32")
+
+
+def index_key(session_data: dict) -> str:
+    """Content key of a session's index: the same documents and chunks give the same key."""
+    documents = session_data.get("documents") or {}
+    if not documents:
+        # Unknown content (e.g. a store built outside the uploader): always write it
+        return uuid.uuid4().hex
+    content = sorted((name, doc["hash"], doc["chunk_ids"]) for name, doc in documents.items())
+    return hashlib.sha256(json.dumps([config.VECTOR_STORE_DTYPE, content]).encode("utf-8")).hexdigest()[:32]
+
+
+class SessionStore:
+    """Chat sessions and their document indexes on disk, shared by the Streamlit processes of a host.
+
+    Session fields are JSON rows in sessions.sqlite, keyed by client (one browser) and
+    session id, with a revision that every save increments so a process can tell that its
+    copy is stale. Indexes are written with ``vector_store.save_store`` to indexes/<key>,
+    keyed by content (``index_key``): an unchanged index is never rewritten, sessions with
+    the same documents share one, and loading memory-maps it.
+    """
+
+    def __init__(self, directory: str):
+        self.index_dir = os.path.join(directory, "indexes")
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "sessions.sqlite"), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (client TEXT, session TEXT, revision INTEGER, "
+                         "index_key TEXT, data TEXT, PRIMARY KEY (client, session))")
+        self._lock = threading.Lock()
+
+    def sessions(self, client: str) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT session FROM sessions WHERE client = ?", (client,))]
+
+    def revision(self, client: str, session: str) -> int:
+        """Current revision of a session, 0 if it was never saved."""
+        with self._lock:
+            row = self._db.execute("SELECT revision FROM sessions WHERE client = ? AND session = ?",
+                                   (client, session)).fetchone()
+        return row[0] if row else 0
+
+    def load(self, client: str, session: str, embeddings: Callable[[], object]) -> Optional[dict]:
+        """Load a session, with its index memory-mapped; ``embeddings`` is only called if there is an index."""
+        from vector_store import load_store
+
+        for attempt in range(2):
+            with self._lock:
+                row = self._db.execute("SELECT revision, index_key, data FROM sessions WHERE client = ? AND session = ?",
+                                       (client, session)).fetchone()
+            if row is None:
+                return None
+            revision, key, data = row
+            session_data = json.loads(data)
+            session_data.update(revision=revision, index=key, vector_store=None)
+            if key is None:
+                return session_data
+            try:
+                session_data["vector_store"] = load_store(os.path.join(self.index_dir, key), embeddings())
+                return session_data
+            except FileNotFoundError:
+                # Another process replaced the index between the two reads: read the row again
+                if attempt:
+                    raise
+
+    def save(self, client: str, session: str, session_data: dict) -> int:
+        """Store a session, writing its index only if its content changed; returns the new revision."""
+        from vector_store import save_store
+
+        store = session_data.get("vector_store")
+        key = None
+        if store is not None:
+            key = index_key(session_data)
+            path = os.path.join(self.index_dir, key)
+            if not os.path.isdir(path):
+                # Written aside and renamed, so readers never see a half-written index
+                tmp = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+                save_store(store, tmp)
+                try:
+                    os.rename(tmp, path)
+                except OSError:
+                    # Another process saved the same content first
+                    shutil.rmtree(tmp, ignore_errors=True)
+
+        fields = {name: value for name, value in session_data.items() if name not in _NOT_STORED}
+        with self._lock, self._db:
+            row = self._db.execute("SELECT index_key FROM sessions WHERE client = ? AND session = ?",
+                                   (client, session)).fetchone()
+            self._db.execute(
+                "INSERT INTO sessions VALUES (?, ?, 1, ?, ?) ON CONFLICT (client, session) DO UPDATE "
+                "SET revision = revision + 1, index_key = excluded.index_key, data = excluded.data",
+                (client, session, key, json.dumps(fields, ensure_ascii=False, default=str)))
+            revision = self._db.execute("SELECT revision FROM sessions WHERE client = ? AND session = ?",
+                                        (client, session)).fetchone()[0]
+            old_key = row[0] if row else None
+            unused = old_key not in (None, key) and self._db.execute(
+                "SELECT 1 FROM sessions WHERE index_key = ? LIMIT 1", (old_key,)).fetchone() is None
+        if unused:
+            # Processes that still map the old files keep reading them until they reload
+            shutil.rmtree(os.path.join(self.index_dir, old_key), ignore_errors=True)
+        session_data.update(revision=revision, index=key)
+        return revision
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> Optional[SessionStore]:
+    """The process-wide session store, or None when SHARED_STATE_DIR is not set."""
+    global _store
+    if not config.SHARED_STATE_DIR:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(config.SHARED_STATE_DIR)
+    return _store
+
+
+# === Export / import ===
+def export_session(session_data: dict, out: BinaryIO):
+    """Write a session to ``out`` as a zip archive that ``import_session`` restores without re-embedding.
+
+    The archive holds manifest.json, messages.jsonl (one message per line), the index files
+    under index/ (see ``vector_store.save_store``) and the generated images under images/.
+    Messages are streamed into the archive and the index is copied from temporary files.
+    """
+    from vector_store import save_store
+
+    store = session_data.get("vector_store")
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        images = {}
+        with archive.open("messages.jsonl", "w") as f:
+            for message in session_data.get("messages", []):
+                path = message.get("image_path")
+                if path and os.path.isfile(path):
+                    images[path] = f"images/{os.path.basename(path)}"
+                    message = dict(message, image_path=images[path])
+                f.write((json.dumps(message, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode("utf-8"))
+        for path, name in images.items():
+            # Already compressed
+            archive.write(path, name, compress_type=zipfile.ZIP_STORED)
+        if store is not None:
+            with tempfile.TemporaryDirectory() as tmp:
+                save_store(store, tmp)
+                for name in sorted(os.listdir(tmp)):
+                    archive.write(os.path.join(tmp, name), f"index/{name}")
+        manifest = {"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION, "index": store is not None}
+        manifest.update((field, session_data.get(field)) for field in _ARCHIVED_FIELDS)
+        archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False))
+
+
+def import_session(archive: BinaryIO, embeddings: Callable[[], object], image_dir: str) -> dict:
+    """Restore a session from an ``export_session`` archive (or an older messages-only JSON export).
+
+    The saved index is loaded as-is, so nothing is re-embedded; ``embeddings`` is only called
+    if there is one (queries still need the model). Images are restored into ``image_dir``.
+    """
+    from vector_store import load_store
+
+    session_data = {"messages": [], "vector_store": None, "uploaded_files": [], "pending_files": [], "documents": {}}
+    if not zipfile.is_zipfile(archive):
+        archive.seek(0)
+        messages = json.load(archive)
+        if not isinstance(messages, list):
+            raise ValueError("Not an InsightBot conversation export.")
+        session_data["messages"] = messages
+        return session_data
+
+    with zipfile.ZipFile(archive) as zf:
+        names = set(zf.namelist())
+        manifest = json.loads(zf.read("manifest.json")) if "manifest.json" in names else {}
+        if manifest.get("format") != ARCHIVE_FORMAT:
+            raise ValueError("Not an InsightBot session archive.")
+        if manifest.get("version", 0) > ARCHIVE_VERSION:
+            raise ValueError("The archive was written by a newer version of InsightBot.")
+        for field in _ARCHIVED_FIELDS:
+            if manifest.get(field) is not None:
+                session_data[field] = manifest[field]
+
+        with zf.open("messages.jsonl") as f:
+            session_data["messages"] = [json.loads(line) for line in io.TextIOWrapper(f, encoding="utf-8") if line.strip()]
+        for message in session_data["messages"]:
+            name = message.pop("image_path", None)
+            # Only plain images/<file> entries are extracted, never arbitrary paths
+            if name is not None and name in names and name == f"images/{os.path.basename(name)}":
+                os.makedirs(image_dir, exist_ok=True)
+                path = os.path.join(image_dir, os.path.basename(name))
+                if not os.path.exists(path):
+                    with zf.open(name) as src, open(path, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                message["image_path"] = path
+
+        if manifest.get("index"):
+            with tempfile.TemporaryDirectory() as tmp:
+                for name in _INDEX_FILES:
+                    if f"index/{name}" in names:
+                        with zf.open(f"index/{name}") as src, open(os.path.join(tmp, name), "wb") as dst:
+                            shutil.copyfileobj(src, dst)
+                # Read into memory: the temporary files are gone once this returns
+                session_data["vector_store"] = load_store(tmp, embeddings(), mmap=False)
+    return session_data
@@ -0,0 +1,129 @@
+from datetime import datetime
+from typing import List
+
+# Keys Groq accepts on chat messages; anything else (files, sources, image paths) is UI-only
+API_MESSAGE_KEYS = ("role", "content", "name", "tool_call_id", "tool_calls")
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "web_search",
+            "description": "Search the web for up-to-date or missing information.",
+            "parameters": {
+                "type": "object",
+                "properties": {"query": {"type": "string"}},
+                "required": ["query"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_image",
+            "description": "Generate an artistic image based on a text prompt.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "prompt": {
+                        "type": "string",
+                        "description": "The detailed description of the image to generate."
+                    }
+                },
+                "required": ["prompt"]
+            }
+        }
+    }
+]
+
+
+def build_system_prompt(doc_context: str = "") -> str:
+    """InsightBot's system prompt, with the retrieved document context appended when present."""
+    system_prompt = f"""
+Current Date: {datetime.now().strftime('%A, %B %d, %Y')}
+Current Time: {datetime.now().strftime('%I:%M:%S %p')}
+
+You are **InsightBot**, a smart, professional, and friendly AI assistant.
+Your role is to help users by providing **accurate, clear, concise, and well-structured responses**, similar to ChatGPT.
+
+---
+
+## 🎯 CORE BEHAVIOR
+- Be **helpful, polite, and natural** in conversation.
+- Answer questions clearly and directly.
+- Adapt your explanation depth based on the user's question.
+- Think step-by-step internally, but present answers cleanly.
+
+---
+
+## 🛡️ IMPORTANT RULES
+1. **No tools for casual messages**  
+   If the user says greetings or casual phrases (e.g., "hi", "hello", "thanks", "cool", "bye"), respond politely in plain text.
+
+2. **Use tools only when necessary**  
+   - Use tools (web search, APIs, etc.) **only** for:
+     - Current facts (prices, latest versions, news, weather)
+     - Real-time or verifiable data
+   - Do NOT use tools for general knowledge or explanations.
+
+3. **Image generation is optional and user-driven**  
+   - Generate images **only if the user explicitly asks** (e.g., "generate an image", "draw", "visualize").
+   - Never generate images for text-only explanations or summaries.
+
+4. **Document-first priority**  
+   - If a DOCUMENT CONTEXT is provided, treat it as the **primary source of truth**.
+   - Do not override or contradict the document unless the user asks for analysis or validation.
+
+5. **No hallucination**  
+   - If you are unsure or lack data, clearly say so.
+   - Never invent facts, sources, or results.
+
+---
+
+## ✍️ RESPONSE STYLE
+- Use **Markdown formatting**:
+  - Headings for sections
+  - Bullet points for clarity
+  - Code blocks for code
+- Be **concise and structured**
+- Avoid filler phrases like:
+  - “Here is the answer…”
+  - “As an AI model…”
+- When summarizing:
+  - Start with a short overview
+  - Follow with bullet points
+
+---
+
+## 🚀 GOAL
+Provide responses that feel:
+- Natural like ChatGPT
+- Professional like a domain expert
+- Simple enough for beginners
+- Precise enough for advanced users
+"""
+
+    if doc_context:
+        system_prompt += (
+            "DOCUMENT CONTEXT (Use this first; cite the numbered sources you use, e.g. [1]):\n"
+            f"{doc_context}\n\n"
+        )
+    return system_prompt
+
+
+def clean_messages(messages: List[dict]) -> List[dict]:
+    """Strip keys Groq doesn't support (like 'files') from chat messages."""
+    return [{k: v for k, v in m.items() if k in API_MESSAGE_KEYS} for m in messages]
+
+
+def build_payload(messages: List[dict], system_prompt: str, model: str, tools: bool = True) -> dict:
+    """Chat completion request for a turn, with the web search and image tools enabled unless ``tools=False``."""
+    payload = {
+        "model": model,
+        "messages": [{"role": "system", "content": system_prompt}] + clean_messages(messages),
+        "max_tokens": 500
+    }
+    if tools:
+        payload["tools"] = TOOLS
+        payload["tool_choice"] = "auto"
+    return payload
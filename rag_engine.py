@@ -1,68 +1,458 @@
+import hashlib
+import json
 import os
-from typing import List, Optional
-from pypdf import PdfReader
-from docx import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-import streamlit as st
+import threading
+import uuid
+from typing import Iterator, List, Optional, Tuple
+import config
+from extractors import extract, file_buffer
+
+# Heavy dependencies (langchain, faiss, torch, pypdf, docx) are imported where they
+# are used so that importing this module at startup stays cheap.
+
 
 class RAGEngine:
     def __init__(self):
-        # Using a small, efficient model for local embeddings
-        self.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
+        # Using a small, efficient model for local embeddings (backend set by EMBEDDING_BACKEND)
+        self.embeddings = None
+        if config.EMBEDDING_SERVICE_ADDRESS or config.EMBEDDING_WORKERS > 0:
+            from embedding_service import RemoteEmbeddings, get_service
+            try:
+                self.embeddings = RemoteEmbeddings(get_service())
+            except OSError as e:
+                # The shared embedding server isn't running: load the model in this process
+                print(f"[InsightBot] Embedding service unavailable ({e}); embedding in-process.")
+        if self.embeddings is None:
+            from embeddings import get_embeddings
+            self.embeddings = get_embeddings()
+        # With shared state, every process on the host reuses one embedding cache
+        cache_path = config.EMBEDDING_CACHE_PATH or (
+            os.path.join(config.SHARED_STATE_DIR, "embeddings.sqlite") if config.SHARED_STATE_DIR else "")
+        if cache_path:
+            from embeddings import CachedEmbeddings
+            self.embeddings = CachedEmbeddings(self.embeddings, cache_path,
+                                               namespace=f"{config.EMBEDDING_MODEL}:{config.EMBEDDING_BACKEND}")
+        if config.CHUNK_STRATEGY == "structure":
+            from chunking import StructureAwareSplitter
+            self.text_splitter = StructureAwareSplitter()
+        else:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200
+            )
+        self.reranker = None
+        if config.RERANK_ENABLED:
+            from reranker import CrossEncoderReranker
+            self.reranker = CrossEncoderReranker()
+        from cache import TTLCache
+        self.retrieval_cache = TTLCache(maxsize=config.RETRIEVAL_CACHE_SIZE)
+
+    def warm_up(self):
+        """Run one throwaway embedding so the first real query doesn't pay for model initialization."""
+        self.embeddings.embed_query("warm-up")
+        if self.reranker is not None:
+            self.reranker.warm_up()
+
+    def extract_sections(self, uploaded_file) -> List[Tuple[str, dict]]:
+        """Extract (text, metadata) sections with the format handler for the file (see extractors.py)."""
+        return list(extract(uploaded_file))
 
     def extract_text(self, uploaded_file) -> str:
-        """Extract text from PDF, DOCX, or TXT."""
-        extension = uploaded_file.name.split('.')[-1].lower()
-        text = ""
-        
-        if extension == 'pdf':
-            reader = PdfReader(uploaded_file)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-        elif extension == 'docx':
-            doc = Document(uploaded_file)
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-        elif extension == 'txt':
-            text = uploaded_file.read().decode('utf-8')
-        else:
-            raise ValueError(f"Unsupported file type: {extension}")
-            
-        return text
+        """Extract the plain text of a supported document."""
+        return "\n\n".join(text for text, _ in extract(uploaded_file))
+
+    def split_sections(self, sections: List[Tuple[str, dict]]) -> Tuple[List[str], List[dict]]:
+        """Chunk extracted sections with the configured splitter (CHUNK_STRATEGY)."""
+        if hasattr(self.text_splitter, "split_sections"):
+            return self.text_splitter.split_sections(sections)
+        chunks = self.text_splitter.split_text("\n".join(text for text, _ in sections))
+        return chunks, [{} for _ in chunks]
+
+    def iter_blocks(self, uploaded_file) -> Iterator[Tuple[List[Tuple[str, dict]], int]]:
+        """Group a document's streamed sections into (sections, offset) blocks of at most about
+        INGEST_WINDOW_CHARS characters; offset is where the block starts in the extracted text."""
+        block, size, offset = [], 0, 0
+        for text, metadata in extract(uploaded_file):
+            if block and size + len(text) > config.INGEST_WINDOW_CHARS:
+                yield block, offset
+                block, offset, size = [], offset + size, 0
+            block.append((text, metadata))
+            # Sections are joined by a blank line in the extracted text
+            size += len(text) + 2
+        if block:
+            yield block, offset
 
     def process_file(self, uploaded_file, session_data: dict):
-        """Process an uploaded file and update the session's vector store."""
+        """Process an uploaded file and update the session's vector store.
+
+        Files are fingerprinted by content. Re-uploading the same content (under any name)
+        reuses the indexed chunks; a changed file with a known name is re-indexed
+        incrementally: only chunks whose text changed are embedded and stale ones removed.
+        Documents are split and embedded block by block (see ``iter_blocks``).
+        """
+        from vector_store import make_writable
+
+        store = session_data.get("vector_store")
+        current_vs, added = store, []
         try:
-            text = self.extract_text(uploaded_file)
-            if not text.strip():
-                return None, "The file seems to be empty or unreadable."
+            name = os.path.basename(uploaded_file.name)
+            digest = file_digest(uploaded_file)
+            documents = session_data.setdefault("documents", {})
+            if is_indexed(session_data, name, digest):
+                return store, f"{name} is already indexed"
+            previous = documents.get(name) if store is not None else None
 
-            chunks = self.text_splitter.split_text(text)
-            
-            current_vs = session_data.get("vector_store")
-            if current_vs is None:
-                session_data["vector_store"] = FAISS.from_texts(chunks, self.embeddings)
+            twin = next((doc for doc in documents.values() if doc["hash"] == digest), None)
+            if twin is not None and store is not None:
+                # Same content under another name: share its chunks, nothing to embed
+                ids, blocks = list(twin["chunk_ids"]), []
             else:
-                new_vs = FAISS.from_texts(chunks, self.embeddings)
-                current_vs.merge_from(new_vs)
-                session_data["vector_store"] = current_vs
-                
-            return session_data["vector_store"], f"Successfully processed {uploaded_file.name}"
+                twin, ids, blocks = None, [], self.iter_blocks(uploaded_file)
+
+            # Chunks still referenced by other documents (identical uploads) are never removed
+            shared = set()
+            if store is not None:
+                shared = {id_ for other, doc in documents.items() if other != name for id_ in doc["chunk_ids"]}
+            old_ids = previous["chunk_ids"] if previous else []
+            indexed = set(old_ids) | shared
+            seen, embedded, unchanged = {}, 0, 0
+            for sections, offset in blocks:
+                chunks, metadatas = self.split_sections(sections)
+                spans = locate_spans("\n\n".join(text for text, _ in sections), chunks)
+                for metadata, (start, end) in zip(metadatas, spans):
+                    metadata.update(source=name, start=None if start is None else offset + start,
+                                    end=None if end is None else offset + end)
+                block_ids = chunk_ids(name, chunks, metadatas, seen)
+                ids.extend(block_ids)
+
+                # Unchanged chunks keep their vectors; only their spans may have moved
+                kept = {id_: metadata for id_, metadata in zip(block_ids, metadatas) if id_ in indexed}
+                _update_metadata(current_vs, kept)
+                unchanged += len(kept)
+                new = [i for i, id_ in enumerate(block_ids) if id_ not in indexed]
+                if new:
+                    new_vs = self.build_store([chunks[i] for i in new], [metadatas[i] for i in new],
+                                              [block_ids[i] for i in new])
+                    added.extend(block_ids[i] for i in new)
+                    if current_vs is None:
+                        current_vs = new_vs
+                    else:
+                        make_writable(current_vs).merge_from(new_vs)
+                    embedded += len(new)
+            if not ids:
+                return None, "The file seems to be empty or unreadable."
+
+            current = set(ids)
+            stale = [id_ for id_ in old_ids if id_ not in shared and id_ not in current]
+            if stale:
+                make_writable(current_vs).delete(stale)
+                _invalidate_cache(current_vs)
+            session_data["vector_store"] = current_vs
+            documents[name] = {"hash": digest, "chunk_ids": ids}
+            # Chunks shared with identical uploads record every name they belong to
+            _update_sources(current_vs, documents, (set(ids) | set(old_ids)) & shared)
+
+            if twin is not None:
+                return current_vs, f"{name} has the same content as an indexed file; reused its chunks"
+            if previous is not None:
+                return current_vs, (f"Re-indexed {name}: {embedded} changed chunks embedded, "
+                                    f"{len(stale)} removed, {unchanged} unchanged")
+            return current_vs, f"Successfully processed {name}"
         except Exception as e:
+            # Don't leave a half-indexed document behind
+            if added and store is not None:
+                store.delete(added)
             return None, f"Error processing file: {str(e)}"
 
+    def process_path(self, path: str, session_data: dict):
+        """Index a file from disk into the session's vector store (see ``process_file``)."""
+        with open(path, "rb") as f:
+            return self.process_file(f, session_data)
+
+    def build_store(self, chunks: List[str], metadatas: Optional[List[dict]] = None,
+                    ids: Optional[List[str]] = None):
+        """Embed chunks into a new vector store of the configured precision (VECTOR_STORE_DTYPE)."""
+        if config.VECTOR_STORE_DTYPE == "float32":
+            from langchain_community.vectorstores import FAISS
+            return FAISS.from_texts(chunks, self.embeddings, metadatas=metadatas, ids=ids)
+        from vector_store import CompactVectorStore
+        return CompactVectorStore.from_texts(chunks, self.embeddings, metadatas=metadatas, ids=ids,
+                                             dtype=config.VECTOR_STORE_DTYPE)
+
+    def retrieve(self, queries: List[str], vector_store, k: int = 3,
+                 filters: Optional[dict] = None) -> List[List[dict]]:
+        """Search the vector store for a batch of queries.
+
+        ``filters`` matches chunk metadata recorded at ingestion, e.g. ``{"source": "report.pdf"}``
+        or ``{"source": ["a.pdf", "b.docx"], "page": 3}``. Returns one list of results per query,
+        each a dict with the chunk text, its distance (lower is closer), source, page, heading
+        and character span in the extracted document.
+        """
+        if vector_store is None or not queries:
+            return [[] for _ in queries]
+        from embeddings import embed_queries
+
+        # Results stay valid until the index grows (its size is part of the key) or its chunks
+        # change otherwise (the store gets a new token)
+        scope = (_store_token(vector_store), vector_store.index.ntotal, k,
+                 json.dumps(filters, sort_keys=True, default=str))
+        results = [self.retrieval_cache.get(scope + (query,)) for query in queries]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+
+        fetch = max(k, config.RERANK_CANDIDATES) if self.reranker is not None else k
+        # One forward pass for the whole batch, at query (interactive) priority
+        vectors = embed_queries(self.embeddings, [queries[i] for i in pending]) if pending else []
+
+        for i, vector in zip(pending, vectors):
+            hits = _search(vector_store, vector, fetch, filters)
+            if self.reranker is not None:
+                distances = {id(doc): distance for doc, distance in hits}
+                docs, _ = self.reranker.rerank(queries[i], [doc for doc, _ in hits], k)
+                hits = [(doc, distances[id(doc)]) for doc in docs]
+            results[i] = [_to_result(doc, distance, filters) for doc, distance in hits[:k]]
+            self.retrieval_cache.set(scope + (queries[i],), results[i])
+        # Callers may annotate results; keep the cached copies pristine
+        return [[dict(result) for result in found] for found in results]
+
     def query_docs(self, query: str, vector_store, k: int = 3) -> str:
         """Search the provided vector store for relevant context."""
-        if vector_store is None:
-            return ""
-        
-        docs = vector_store.similarity_search(query, k=k)
-        context = "\n\n".join([doc.page_content for doc in docs])
-        return context
+        results = self.retrieve([query], vector_store, k=k)[0]
+        return "\n\n".join(result["text"] for result in results)
+
+
+def _store_token(vector_store) -> str:
+    """Identity of a vector store's current content for the shared retrieval cache.
+
+    A random token stored on the store itself: unlike ``id()``, it is never reused by
+    another session's store once this one is freed. It is replaced whenever chunks are
+    removed or their metadata changes (``_invalidate_cache``), which leave the size as is.
+    """
+    token = getattr(vector_store, "_cache_token", None)
+    if token is None:
+        token = vector_store._cache_token = uuid.uuid4().hex
+    return token
+
+
+def _invalidate_cache(vector_store):
+    """Stop serving results cached for the store before a change; other stores keep theirs."""
+    vector_store._cache_token = None
+
+
+def _allowed(filters: dict, key: str) -> list:
+    value = filters[key]
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _filter_func(filters: Optional[dict]):
+    """Metadata predicate for ``filters``: every key must have one of its allowed values.
+    A ``source`` filter also matches the other names of identical uploads (``sources``)."""
+    if not filters:
+        return None
+    allowed = {key: _allowed(filters, key) for key in filters}
+
+    def matches(metadata: dict) -> bool:
+        for key, values in allowed.items():
+            found = (metadata.get("sources") or [metadata.get("source")]) if key == "source" else [metadata.get(key)]
+            if not any(value in values for value in found):
+                return False
+        return True
+
+    return matches
+
+
+def _search(vector_store, vector, k: int, filters: Optional[dict]):
+    """Nearest chunks to ``vector`` that match ``filters``.
+
+    LangChain's FAISS store only filters its ``fetch_k`` nearest chunks, so the search is
+    widened until k of them match (CompactVectorStore widens on its own).
+    """
+    from vector_store import CompactVectorStore
+
+    matches = _filter_func(filters)
+    fetch_k = max(20, k * 10)
+    while True:
+        hits = vector_store.similarity_search_with_score_by_vector(vector, k=k, filter=matches, fetch_k=fetch_k)
+        if (not filters or len(hits) >= k or fetch_k >= vector_store.index.ntotal
+                or isinstance(vector_store, CompactVectorStore)):
+            return hits
+        fetch_k *= 4
+
+
+def _to_result(doc, distance, filters: Optional[dict] = None) -> dict:
+    metadata = doc.metadata or {}
+    source = metadata.get("source")
+    if filters and "source" in filters:
+        # Cite an identical upload under the name that was asked for
+        source = next((name for name in metadata.get("sources") or [] if name in _allowed(filters, "source")), source)
+    return {
+        "text": doc.page_content,
+        "distance": round(float(distance), 4),
+        "source": source,
+        "page": metadata.get("page"),
+        "heading": metadata.get("heading"),
+        "slide": metadata.get("slide"),
+        "sheet": metadata.get("sheet"),
+        "rows": metadata.get("rows"),
+        "start": metadata.get("start"),
+        "end": metadata.get("end"),
+    }
+
+
+def file_digest(uploaded_file) -> str:
+    """Content fingerprint of an uploaded file (or open binary file)."""
+    with file_buffer(uploaded_file) as view:
+        return hashlib.sha256(view).hexdigest()
+
+
+def is_indexed(session_data: dict, name: str, digest: str) -> bool:
+    """True if the session already holds this exact content under this name."""
+    document = (session_data.get("documents") or {}).get(name)
+    return document is not None and document["hash"] == digest and session_data.get("vector_store") is not None
+
+
+def chunk_ids(source: str, chunks: List[str], metadatas: List[dict], seen: Optional[dict] = None) -> List[str]:
+    """Deterministic chunk ids: the same text on the same page / under the same heading of a
+    document always gets the same id, so a changed upload only re-embeds what changed.
+    Pass the same ``seen`` dict for every block of one document."""
+    ids, seen = [], {} if seen is None else seen
+    for chunk, metadata in zip(chunks, metadatas):
+        key = "\0".join([source, str(metadata.get("page")), str(metadata.get("heading")), chunk])
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        # Repeated identical chunks (boilerplate) get numbered
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        ids.append(digest if n == 0 else f"{digest}-{n}")
+    return ids
+
+
+def _update_sources(vector_store, documents: dict, ids: set):
+    """Set ``source`` (the first name) and ``sources`` (all names, when more than one) on chunks
+    shared by several documents, so filters and citations work under any of their names."""
+    if not ids:
+        return
+    owners = {}
+    for name, doc in documents.items():
+        for id_ in doc["chunk_ids"]:
+            if id_ in ids:
+                owners.setdefault(id_, []).append(name)
+    if hasattr(vector_store, "get_metadata"):
+        current = vector_store.get_metadata(list(owners))
+    else:
+        docs = {id_: vector_store.docstore.search(id_) for id_ in owners}
+        current = {id_: dict(doc.metadata) for id_, doc in docs.items() if not isinstance(doc, str)}
+    updates = {}
+    for id_, metadata in current.items():
+        names = owners[id_]
+        metadata = dict(metadata, source=names[0])
+        metadata.pop("sources", None)
+        if len(names) > 1:
+            metadata["sources"] = names
+        updates[id_] = metadata
+    _update_metadata(vector_store, updates)
+
+
+def _update_metadata(vector_store, updates: dict):
+    if not updates or vector_store is None:
+        return
+    _invalidate_cache(vector_store)
+    if hasattr(vector_store, "update_metadata"):
+        vector_store.update_metadata(updates)
+        return
+    # LangChain's FAISS store keeps Documents in its docstore
+    for id_, metadata in updates.items():
+        doc = vector_store.docstore.search(id_)
+        if not isinstance(doc, str):
+            doc.metadata = metadata
+
+
+def locate_spans(text: str, chunks: List[str]) -> List[Tuple[Optional[int], Optional[int]]]:
+    """Find the (start, end) character span of each chunk in the extracted document text.
+
+    Splitters may re-join pieces with different whitespace or repeat a heading, so each chunk
+    is located by its first and last lines rather than by an exact match. Unlocatable chunks
+    get (None, None).
+    """
+    spans, cursor = [], 0
+    for chunk in chunks:
+        lines = [line.strip() for line in chunk.splitlines() if line.strip()]
+        head = -1
+        # A continuation chunk's repeated heading isn't found past the cursor: fall back to its next line
+        for probe in lines[:2]:
+            head = text.find(probe[:80], cursor)
+            if head >= 0:
+                break
+        if head < 0:
+            spans.append((None, None))
+            continue
+        tail = lines[-1][-80:]
+        end = text.find(tail, head)
+        spans.append((head, end + len(tail) if end >= 0 else None))
+        # Overlapping chunks may start before the previous chunk ended
+        cursor = head + 1
+    return spans
+
+
+def format_source(result: dict) -> str:
+    """Short human-readable label for a retrieval result, e.g. 'report.pdf, p. 3 – Budget'."""
+    label = result.get("source") or "document"
+    if result.get("page"):
+        label += f", p. {result['page']}"
+    if result.get("slide"):
+        label += f", slide {result['slide']}"
+    if result.get("sheet"):
+        label += f", {result['sheet']}"
+    if result.get("rows"):
+        label += f", rows {result['rows']}"
+    if result.get("heading"):
+        label += f" – {result['heading']}"
+    return label
+
+
+def format_context(results: List[dict]) -> str:
+    """Render retrieval results as numbered, citable context blocks for the system prompt."""
+    return "\n\n".join(
+        f"[{i}] ({format_source(result)})\n{result['text']}" for i, result in enumerate(results, start=1)
+    )
+
+
+# === Process-wide engine ===
+# A single engine is shared by every Streamlit session and the background warm-up thread.
+_engine: Optional[RAGEngine] = None
+_engine_lock = threading.Lock()
+_warmup_thread: Optional[threading.Thread] = None
+
+
+def get_engine() -> RAGEngine:
+    """Return the shared RAGEngine, loading and warming the model on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = RAGEngine()
+                engine.warm_up()
+                _engine = engine
+    return _engine
+
+
+def is_engine_ready() -> bool:
+    """True once the embedding model has been loaded and warmed."""
+    return _engine is not None
+
+
+def _warm_up_quietly():
+    try:
+        get_engine()
+    except Exception as e:
+        # The engine will be retried (and the error surfaced) on the first upload
+        print(f"[InsightBot] Embedding warm-up failed: {e}")
+
 
+def start_warmup():
+    """Load the embedding model in a background thread (at most once per process)."""
+    global _warmup_thread
+    with _engine_lock:
+        if _warmup_thread is not None or _engine is not None:
+            return
+        _warmup_thread = threading.Thread(target=_warm_up_quietly, name="rag-warmup", daemon=True)
+        _warmup_thread.start()
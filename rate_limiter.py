@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import itertools
+import json
+import threading
+import time
+from typing import Optional
+
+import config
+
+# Request priorities (the same values as the embedding service's queue)
+INTERACTIVE = 0
+BULK = 1
+
+
+class _Bucket:
+    """Token bucket holding up to ``limit``, refilled continuously over ``period`` seconds."""
+
+    def __init__(self, limit: int, period: float):
+        self.capacity = float(limit)
+        self.rate = limit / period
+        self.level = float(limit)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, amount: float) -> float:
+        # Requests larger than the whole bucket go through once it is full rather than never
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter:
+    """Process-wide scheduler for Groq calls under requests-per-minute and tokens-per-minute limits.
+
+    Callers ``acquire`` capacity for one request before sending it and are granted strictly
+    in priority order (interactive chat before bulk batch jobs, FIFO within a priority).
+    A 429's Retry-After ``pause``s every caller, not just the one that was rejected, and
+    ``settle`` corrects the token reservation once the real usage is known. Works across
+    threads and event loops (Streamlit turns share one background loop; batch jobs run their own).
+    """
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None, period: float = 60.0):
+        rpm = config.GROQ_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        tpm = config.GROQ_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        # ``period`` is the length of the limit window; benchmarks shorten it to run faster
+        self._requests = _Bucket(rpm, period) if rpm > 0 else None
+        self._tokens = _Bucket(tpm, period) if tpm > 0 else None
+        self._lock = threading.Lock()
+        self._waiters = []  # heap of [priority, seq, tokens, loop, future]
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self.pauses = 0
+
+    async def acquire(self, tokens: int, priority: int = INTERACTIVE) -> float:
+        """Wait until one request of ``tokens`` tokens may be sent; returns the time waited in ms."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = [priority, next(self._seq), tokens, loop, future]
+        started = time.monotonic()
+        with self._lock:
+            heapq.heappush(self._waiters, waiter)
+            delay = self._grant()
+        try:
+            while not future.done():
+                try:
+                    # Whoever wakes first grants every request that now fits, in order
+                    await asyncio.wait_for(asyncio.shield(future), timeout=max(delay, 0.005))
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        delay = self._grant()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        return round((time.monotonic() - started) * 1000, 1)
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """Return (or charge) the difference between the reserved and the reported token usage."""
+        if self._tokens is None or used is None:
+            return
+        with self._lock:
+            self._tokens.refill(time.monotonic())
+            reserved = min(reserved, self._tokens.capacity)
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + reserved - used)
+
+    def pause(self, seconds: float):
+        """Hold all grants for ``seconds`` (the server asked us to back off)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.pauses += 1
+
+    def sync(self, headers):
+        """Lower the local buckets to the server's ``x-ratelimit-remaining-*`` counts, if reported."""
+        with self._lock:
+            for bucket, name in ((self._requests, "requests"), (self._tokens, "tokens")):
+                value = headers.get(f"x-ratelimit-remaining-{name}")
+                if bucket is not None and value is not None:
+                    try:
+                        bucket.level = min(bucket.level, float(value))
+                    except ValueError:
+                        pass
+
+    def queued(self) -> int:
+        with self._lock:
+            return sum(1 for waiter in self._waiters if not waiter[4].done())
+
+    def _grant(self) -> float:
+        """Grant queued requests in priority order; returns seconds until the head could be granted."""
+        now = time.monotonic()
+        for bucket in (self._requests, self._tokens):
+            if bucket is not None:
+                bucket.refill(now)
+        while self._waiters:
+            _, _, tokens, loop, future = self._waiters[0]
+            if future.done() or loop.is_closed():
+                # Cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            wait = max(
+                self._paused_until - now,
+                self._requests.wait(1) if self._requests is not None else 0.0,
+                self._tokens.wait(tokens) if self._tokens is not None else 0.0,
+            )
+            if wait > 0:
+                return wait
+            heapq.heappop(self._waiters)
+            if self._requests is not None:
+                self._requests.level -= 1
+            if self._tokens is not None:
+                self._tokens.level -= min(tokens, self._tokens.capacity)
+            loop.call_soon_threadsafe(_resolve, future)
+        return 0.0
+
+
+def estimate_tokens(payload: dict) -> int:
+    """Rough prompt + completion token count of a chat request (about 4 characters per token)."""
+    chars = sum(len(str(m.get("content") or "")) for m in payload.get("messages", []))
+    if payload.get("tools"):
+        chars += len(json.dumps(payload["tools"]))
+    return chars // 4 + payload.get("max_tokens", 0)
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> Optional[RateLimiter]:
+    """The process-wide limiter, or None when no Groq limits are configured."""
+    global _limiter
+    if config.GROQ_REQUESTS_PER_MINUTE <= 0 and config.GROQ_TOKENS_PER_MINUTE <= 0:
+        return None
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+    return _limiter
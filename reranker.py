@@ -0,0 +1,58 @@
+import time
+from typing import List, Tuple
+
+import config
+
+
+class CrossEncoderReranker:
+    """Reorders retrieved chunks with a small local cross-encoder, within a latency budget.
+
+    The reranker keeps a running estimate of the cost of scoring one (query, chunk) pair
+    and only scores as many candidates as fit in the budget. If not even the requested
+    number of results fits, or the deadline passes mid-way, the vector search order is kept.
+    """
+
+    def __init__(self, model_name: str = None, batch_size: int = None):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name or config.RERANK_MODEL, device="cpu")
+        self.batch_size = batch_size or config.RERANK_BATCH_SIZE
+        self._seconds_per_pair = None
+
+    def warm_up(self):
+        self._score("warm-up", ["warm-up"])
+
+    def rerank(self, query: str, docs: List, top_n: int, budget_ms: int = None) -> Tuple[List, bool]:
+        """Return the best ``top_n`` docs and whether the cross-encoder order was used."""
+        if len(docs) <= 1:
+            return docs[:top_n], False
+        budget = (budget_ms if budget_ms is not None else config.RERANK_BUDGET_MS) / 1000
+        deadline = time.perf_counter() + budget
+
+        # Score the head of the vector ranking that is expected to fit in the budget
+        affordable = len(docs)
+        if self._seconds_per_pair:
+            affordable = min(affordable, int(budget / self._seconds_per_pair))
+        if affordable < top_n:
+            return docs[:top_n], False
+
+        scores = []
+        for start in range(0, affordable, self.batch_size):
+            if time.perf_counter() > deadline:
+                return docs[:top_n], False
+            batch = docs[start:min(affordable, start + self.batch_size)]
+            scores.extend(self._score(query, [doc.page_content for doc in batch]))
+
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        # Unscored candidates keep their vector order behind the reranked ones
+        ranked = [docs[i] for i in order] + docs[affordable:]
+        return ranked[:top_n], True
+
+    def _score(self, query: str, texts: List[str]) -> List[float]:
+        t = time.perf_counter()
+        scores = self.model.predict([(query, text) for text in texts], batch_size=self.batch_size)
+        per_pair = (time.perf_counter() - t) / len(texts)
+        # Exponential moving average smooths out scheduler noise between calls
+        self._seconds_per_pair = per_pair if self._seconds_per_pair is None \
+            else 0.8 * self._seconds_per_pair + 0.2 * per_pair
+        return [float(s) for s in scores]
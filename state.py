@@ -1,5 +1,7 @@
+import uuid
 from datetime import datetime
 import streamlit as st
+from persistence import get_session_store
 
 def get_timestamp():
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -10,7 +12,8 @@ def create_new_session():
         "messages": [{"role": "assistant", "content": "Welcome to **InsightBot**. How can I help you today?"}],
         "vector_store": None,
         "uploaded_files": [],
-        "pending_files": []
+        "pending_files": [],
+        "documents": {}
     }
 
 def get_current_session_data():
@@ -18,10 +21,48 @@ def get_current_session_data():
     session_id = st.session_state.current_session
     return st.session_state.all_sessions.get(session_id, create_new_session())
 
+def get_client_id():
+    """Identifies one browser across Streamlit processes; carried in the URL (?client=...)."""
+    if "client_id" not in st.session_state:
+        st.session_state.client_id = st.query_params.get("client") or uuid.uuid4().hex
+    return st.session_state.client_id
+
+def _load_shared_sessions(store):
+    """Fill in this browser's sessions from the shared store, reloading the open one if
+    another process saved a newer revision."""
+    from rag_engine import get_engine
+
+    client = get_client_id()
+    all_sessions = st.session_state.all_sessions
+    for session_id in store.sessions(client):
+        # Other sessions are loaded when the user switches to them
+        all_sessions.setdefault(session_id, None)
+    if "current_session" not in st.session_state and st.query_params.get("session") in all_sessions:
+        # A reload, or a request routed to another process: reopen the chat named in the URL
+        st.session_state.current_session = st.query_params["session"]
+    current = st.session_state.get("current_session")
+    if current in all_sessions:
+        local = all_sessions[current]
+        if local is None or store.revision(client, current) > local.get("revision", 0):
+            loaded = store.load(client, current, lambda: get_engine().embeddings)
+            all_sessions[current] = loaded or local or create_new_session()
+
+def save_session(session_id=None):
+    """Save a session to the shared store so any process can serve it (no-op without SHARED_STATE_DIR)."""
+    store = get_session_store()
+    if store is None:
+        return
+    session_id = session_id or st.session_state.current_session
+    store.save(get_client_id(), session_id, st.session_state.all_sessions[session_id])
+
 def initialize_state():
     if "all_sessions" not in st.session_state:
         st.session_state.all_sessions = {}
 
+    store = get_session_store()
+    if store is not None:
+        _load_shared_sessions(store)
+
     # Migrate old sessions (list format) to new format (dict format)
     for session_id, session_data in st.session_state.all_sessions.items():
         if isinstance(session_data, list):
@@ -30,10 +71,18 @@ def initialize_state():
                 "messages": session_data,
                 "vector_store": None,
                 "uploaded_files": [],
-                "pending_files": []
+                "pending_files": [],
+                "documents": {}
             }
 
     if "current_session" not in st.session_state or st.session_state.current_session not in st.session_state.all_sessions:
         session_id = get_timestamp()
         st.session_state.current_session = session_id
         st.session_state.all_sessions[session_id] = create_new_session()
+
+    # Sticky sessions: the URL names the browser and the open chat
+    if store is not None:
+        if st.query_params.get("client") != get_client_id():
+            st.query_params["client"] = get_client_id()
+        if st.query_params.get("session") != st.session_state.current_session:
+            st.query_params["session"] = st.session_state.current_session
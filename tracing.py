@@ -0,0 +1,188 @@
+import contextvars
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import config
+
+# Stage latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Numeric span attributes that are summed into Prometheus counters
+COUNTERS = ("prompt_tokens", "completion_tokens", "bytes", "cache_hit")
+
+_current_turn = contextvars.ContextVar("insightbot_turn", default=None)
+
+
+class Turn:
+    """Timing spans recorded while answering one chat message."""
+
+    def __init__(self, session_id: str):
+        self.turn_id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.timestamp = datetime.now().isoformat(timespec="seconds")
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self.spans = []
+
+    def to_dict(self) -> dict:
+        return {
+            "turn_id": self.turn_id,
+            "session_id": self.session_id,
+            "timestamp": self.timestamp,
+            "duration_ms": self.duration_ms,
+            "spans": self.spans,
+        }
+
+
+def start_turn(session_id: str) -> Turn:
+    """Begin recording spans for a chat turn on the current thread / task."""
+    turn = Turn(session_id)
+    _current_turn.set(turn)
+    return turn
+
+
+def current_turn() -> Optional[Turn]:
+    return _current_turn.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a stage of the current turn.
+
+    Yields the span's attribute dict so callers can attach counts discovered while the
+    stage runs (tokens, bytes, cache hits, ...). Outside a turn nothing is recorded.
+    """
+    turn = _current_turn.get()
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if turn is not None:
+            record = {
+                "name": name,
+                "start_ms": round((start - turn.started) * 1000, 1),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+            record.update(attrs)
+            turn.spans.append(record)
+
+
+def finish_turn(turn: Turn) -> dict:
+    """Close the turn, export it (JSONL / Prometheus) and return it as a dict."""
+    turn.duration_ms = round((time.perf_counter() - turn.started) * 1000, 1)
+    if _current_turn.get() is turn:
+        _current_turn.set(None)
+    trace = turn.to_dict()
+    if config.TRACE_JSONL_PATH:
+        _write_jsonl(trace)
+    if config.TRACE_PROMETHEUS_PORT:
+        _metrics.observe(trace)
+    return trace
+
+
+# === JSONL export ===
+_jsonl_lock = threading.Lock()
+
+
+def _write_jsonl(trace: dict):
+    line = json.dumps(trace, separators=(",", ":"), default=str)
+    with _jsonl_lock, open(config.TRACE_JSONL_PATH, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+# === Prometheus export ===
+class _Metrics:
+    """Process-wide aggregate of turn and stage timings in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._turns = 0
+
+    def observe(self, trace: dict):
+        with self._lock:
+            self._turns += 1
+            self._observe("turn", trace["duration_ms"] / 1000)
+            for s in trace["spans"]:
+                self._observe(s["name"], s["duration_ms"] / 1000)
+                for counter in COUNTERS:
+                    value = s.get(counter)
+                    if isinstance(value, (bool, int, float)):
+                        key = (s["name"], counter)
+                        self._counters[key] = self._counters.get(key, 0) + float(value)
+
+    def _observe(self, stage, seconds):
+        buckets, total, count = self._stages.get(stage, ([0] * len(BUCKETS), 0.0, 0))
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+        self._stages[stage] = (buckets, total + seconds, count + 1)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP insightbot_turns_total Chat turns answered.",
+                "# TYPE insightbot_turns_total counter",
+                f"insightbot_turns_total {self._turns}",
+                "# HELP insightbot_stage_seconds Latency of each stage of a chat turn.",
+                "# TYPE insightbot_stage_seconds histogram",
+            ]
+            for stage, (buckets, total, count) in sorted(self._stages.items()):
+                for bound, value in zip(BUCKETS, buckets):
+                    lines.append(f'insightbot_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {value}')
+                lines.append(f'insightbot_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'insightbot_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+                lines.append(f'insightbot_stage_seconds_count{{stage="{stage}"}} {count}')
+            lines += [
+                "# HELP insightbot_stage_total Tokens, bytes and cache hits recorded per stage.",
+                "# TYPE insightbot_stage_total counter",
+            ]
+            for (stage, counter), value in sorted(self._counters.items()):
+                lines.append(f'insightbot_stage_total{{stage="{stage}",counter="{counter}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+
+_metrics = _Metrics()
+_metrics_server_started = False
+_metrics_server_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = _metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int):
+    """Serve /metrics on localhost:port from a daemon thread (once per process)."""
+    global _metrics_server_started
+    with _metrics_server_lock:
+        if _metrics_server_started:
+            return
+        _metrics_server_started = True
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        except OSError as e:
+            # Typically another worker process already serves this port
+            print(f"[InsightBot] Metrics endpoint unavailable on port {port}: {e}")
+            return
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
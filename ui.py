@@ -1,65 +1,21 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import json
-import requests
+import io
 import os
 import datetime
 from dotenv import load_dotenv
-from state import get_timestamp
-from image_gen import generate_image_hf
+import config
+from state import get_timestamp, save_session
+from extractors import supported_extensions
+from rag_engine import file_digest, is_indexed
 
 # Load environment variables
 load_dotenv()
 
-# Initialize RAG Engine lazily
-@st.cache_resource(show_spinner=False)
+# RAG Engine is a process-wide singleton, possibly already warmed in the background at startup
 def get_rag_engine():
-    from rag_engine import RAGEngine
-    return RAGEngine()
-
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-SERPER_API_KEY = os.getenv("SERPER_API_KEY")
-
-def search_web(query):
-    """Perform a web search using Serper API."""
-    if not SERPER_API_KEY or SERPER_API_KEY == "your_serper_api_key_here":
-        return "Error: Serper API key not configured."
-    
-    url = "https://google.serper.dev/search"
-    payload = json.dumps({"q": query})
-    headers = {
-        'X-API-KEY': SERPER_API_KEY,
-        'Content-Type': 'application/json'
-    }
-    
-    try:
-        response = requests.request("POST", url, headers=headers, data=payload, timeout=10)
-        results = response.json()
-        
-        output = []
-        # Priority 1: Google's direct answer box
-        if results.get("answerBox"):
-            answer = results["answerBox"].get("answer") or results["answerBox"].get("snippet")
-            if answer:
-                output.append(f"DIRECT ANSWER: {answer}")
-
-        # Priority 2: Knowledge Graph
-        if results.get("knowledgeGraph"):
-            kg = results["knowledgeGraph"]
-            output.append(f"KNOWLEDGE GRAPH: {kg.get('title')} - {kg.get('description')}")
-
-        # Priority 3: Organic snippets
-        for result in results.get("organic", []):
-            title = result.get('title', 'No Title')
-            snippet = result.get('snippet', 'No Snippet')
-            link = result.get('link', 'No Link')
-            output.append(f"🔍 REAL-TIME TRUTH from {title}\nLINK: {link}\nCONTENT: {snippet}")
-        
-        return "\n\n---\n\n".join(output[:4]) if output else "No results found."
-    except Exception as e:
-        return f"Error during search: {e}"
+    from rag_engine import get_engine
+    return get_engine()
 
 def render_sidebar(messages):
     from state import create_new_session
@@ -75,6 +31,7 @@ def render_sidebar(messages):
         session_id = get_timestamp()
         st.session_state.current_session = session_id
         st.session_state.all_sessions[session_id] = create_new_session()
+        save_session(session_id)
         st.rerun()
 
     st.sidebar.markdown("---")
@@ -89,15 +46,77 @@ def render_sidebar(messages):
                 st.session_state.current_session = sid
                 st.rerun()
 
-    # Chat export
+    # Stage timings of the last answered turn
+    if config.TRACE_DEBUG_PANEL:
+        render_trace_panel(st.session_state.all_sessions[st.session_state.current_session].get("last_trace"))
+
+    # Chat export: the archive is only built when the button is clicked
     st.sidebar.markdown("---")
+    session_data = st.session_state.all_sessions[st.session_state.current_session]
     st.sidebar.download_button(
-        label="📥 Download Conversation",
-        data=json.dumps(messages, indent=2),
-        file_name=f"insight_{st.session_state.current_session.replace(':', '-')}.json",
-        mime="application/json",
+        label="📥 Export Conversation",
+        data=lambda: export_archive(session_data),
+        file_name=f"insight_{st.session_state.current_session.replace(':', '-')}.zip",
+        mime="application/zip",
+        help="Messages, document index and generated images; import it to continue without re-uploading.",
         use_container_width=True
     )
+    archive = st.sidebar.file_uploader("📤 Import Conversation", type=["zip", "json"], key="session_import")
+    if archive is not None:
+        import_archive(archive)
+
+
+def export_archive(session_data):
+    from persistence import export_session
+    buffer = io.BytesIO()
+    export_session(session_data, buffer)
+    return buffer.getvalue()
+
+
+def upload_digest(uf):
+    """Content hash of an uploaded file, computed once per upload rather than on every rerun."""
+    digests = st.session_state.setdefault("upload_digests", {})
+    if uf.file_id not in digests:
+        digests[uf.file_id] = file_digest(uf)
+    return digests[uf.file_id]
+
+
+def import_archive(archive):
+    """Restore an exported conversation as a new session, once per archive."""
+    from chat_engine import IMAGE_DIR
+    from persistence import import_session
+    imported = st.session_state.setdefault("imported_archives", set())
+    digest = upload_digest(archive)
+    if digest in imported:
+        return
+    try:
+        session_data = import_session(archive, lambda: get_rag_engine().embeddings, IMAGE_DIR)
+    except Exception as e:
+        st.sidebar.error(f"Could not import {archive.name}: {e}")
+        return
+    imported.add(digest)
+    session_id = f"{get_timestamp()} (imported)"
+    n = 2
+    while session_id in st.session_state.all_sessions:
+        session_id = f"{get_timestamp()} (imported {n})"
+        n += 1
+    st.session_state.all_sessions[session_id] = session_data
+    st.session_state.current_session = session_id
+    save_session(session_id)
+    st.rerun()
+
+def render_trace_panel(trace):
+    with st.sidebar.expander("⏱️ Last Turn Timings", expanded=False):
+        if not trace:
+            st.caption("No turn recorded yet in this chat.")
+            return
+        st.caption(f"Total: {trace['duration_ms']:.0f} ms")
+        for s in trace["spans"]:
+            extras = {k: v for k, v in s.items() if k not in ("name", "start_ms", "duration_ms", "query", "prompt")}
+            details = " · ".join(f"{k}={v}" for k, v in extras.items())
+            st.markdown(f"**{s['name']}** — {s['duration_ms']:.0f} ms (at +{s['start_ms']:.0f} ms)")
+            if details:
+                st.caption(details)
 
 
 def render_header():
@@ -437,6 +456,13 @@ def render_messages(messages):
             # Estimate height based on content length
             estimated_height = max(80, min(400, 60 + len(msg["content"]) // 3))
             components.html(bubble_html, height=estimated_height)
+
+            # Document sources the answer was grounded on
+            if msg.get("sources"):
+                from rag_engine import format_source
+                st.caption("📚 Sources: " + " · ".join(
+                    f"[{i}] {format_source(src)}" for i, src in enumerate(msg["sources"], start=1)
+                ))
             
     # Show Pending Files (Files uploaded but not yet "sent" with a prompt)
     session_data = st.session_state.all_sessions[st.session_state.current_session]
@@ -479,13 +505,13 @@ def handle_chat_input(messages):
         
         with col1:
             # The "Plus" or "Clip" button for attachments
-            with st.popover("📎", help="Add documents (PDF, DOCX, TXT)"):
+            with st.popover("📎", help=f"Add documents ({', '.join(ext.upper() for ext in supported_extensions())})"):
                 st.markdown("### 📂 Add Knowledge")
                 # Use session-specific key so each chat has isolated upload state
                 uploader_key = f"file_uploader_{st.session_state.current_session.replace(' ', '_').replace(':', '_').replace('-', '_')}"
                 uploaded_files = st.file_uploader(
                     "Upload files", 
-                    type=['pdf', 'docx', 'txt'], 
+                    type=list(supported_extensions()), 
                     accept_multiple_files=True,
                     key=uploader_key,
                     label_visibility="collapsed"
@@ -494,19 +520,26 @@ def handle_chat_input(messages):
                 if uploaded_files:
                     re = get_rag_engine()
                     processed_any = False
-                    for uf in uploaded_files:
-                        if uf.name not in uploaded_files_list:
+                    # Latest upload wins when a file with the same name is uploaded again
+                    latest = {uf.name: uf for uf in uploaded_files}
+                    for uf in latest.values():
+                        # Fingerprint by content: renamed copies reuse their chunks, changed files re-index
+                        if not is_indexed(session_data, uf.name, upload_digest(uf)):
                             with st.status(f"Indexing {uf.name}...", expanded=False) as status:
                                 vs, msg = re.process_file(uf, session_data)
                                 if vs:
-                                    session_data["uploaded_files"].append(uf.name)
-                                    session_data["pending_files"].append(uf.name)
+                                    if uf.name not in session_data["uploaded_files"]:
+                                        session_data["uploaded_files"].append(uf.name)
+                                    if uf.name not in session_data["pending_files"]:
+                                        session_data["pending_files"].append(uf.name)
                                     status.update(label=f"✅ {uf.name} Ready", state="complete")
+                                    st.toast(msg)
                                     processed_any = True
                                 else:
                                     st.error(msg)
                     
                     if processed_any:
+                        save_session()
                         st.rerun()
 
                 if uploaded_files_list:
@@ -519,6 +552,8 @@ def handle_chat_input(messages):
                         session_data["vector_store"] = None
                         session_data["uploaded_files"] = []
                         session_data["pending_files"] = []
+                        session_data["documents"] = {}
+                        save_session()
                         st.rerun()
 
         with col2:
@@ -541,115 +576,45 @@ def handle_chat_input(messages):
             
         messages.append(new_msg)
         session_data["messages"] = messages
+        save_session()
         st.rerun()
 
-def handle_interaction(payload, messages):
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    try:
-        # Step 1: Attempt interaction with potential tool use
-        r = requests.post(GROQ_API_URL, json=payload, headers=headers, timeout=30)
-        
-        # Step 2: Fallback if tool-calling fails (Groq specific error handling)
-        if r.status_code != 200:
-            error_data = r.json()
-            err_msg = error_data.get('error', {}).get('message', '')
-            
-            # If the specific model doesn't support tools or is failing, fallback to no-tool streaming
-            if "Failed to call a function" in err_msg or r.status_code == 400:
-                fallback_payload = payload.copy()
-                fallback_payload.pop("tools", None)
-                fallback_payload.pop("tool_choice", None)
-                fallback_payload["stream"] = True
-                st.info("🔄 Optimizing response path...")
-                return stream_response(fallback_payload)
-            
-            st.error(f"🚀 Groq API Error: {err_msg}")
-            return "I'm having trouble connecting right now. Please try again."
-
-        result = r.json()
-        if 'choices' not in result or not result['choices']:
-            return "The AI returned an empty response."
-
-        message = result['choices'][0]['message']
-        
-        if message.get("tool_calls"):
-            tool_call = message["tool_calls"][0]
-            function_name = tool_call["function"]["name"]
-            function_args = json.loads(tool_call["function"]["arguments"])
-            if function_name == "web_search":
-                with st.status("🔍 Searching the web...", expanded=False):
-                    search_results = search_web(function_args.get("query"))
-                    if not search_results or "No results found" in search_results:
-                        search_results = "The web search returned no relevant results for this query."
-                    st.write("Summarizing information...")
-                
-                # Add the tool results to conversation
-                messages.append(message) # Add the assistant tool call message
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call["id"],
-                    "name": function_name,
-                    "content": search_results
-                })
-                
-                # Get the final response
-                # Clean messages for API
-                api_convo = []
-                for m in messages:
-                    api_convo.append({k: v for k, v in m.items() if k in ["role", "content", "name", "tool_call_id", "tool_calls"]})
-
-                final_payload = {
-                    "model": payload["model"],
-                    "messages": [
-                        payload["messages"][0], # System prompt
-                        *api_convo
-                    ],
-                    "stream": True,
-                    "max_tokens": 500
-                }
-                return stream_response(final_payload)
-
-            elif function_name == "generate_image":
-                image_prompt = function_args.get("prompt")
-                with st.status(f"🎨 Painting: {image_prompt}...", expanded=True) as status:
-                    image, error = generate_image_hf(image_prompt)
-                    if error:
-                        st.error(error)
-                        return f"I tried to generate that image, but ran into an issue: {error}"
-                    
-                    # Save the image
-                    if not os.path.exists("generated_images"):
-                        os.makedirs("generated_images")
-                    img_path = f"generated_images/img_{get_timestamp().replace(':', '-')}.png"
-                    image.save(img_path)
-                    status.update(label="✅ Vision complete!", state="complete")
-                
-                # Add the tool results to conversation for history
-                messages.append(message) # Assistant's tool call
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call["id"],
-                    "name": function_name,
-                    "content": f"Generated image for: {image_prompt}",
-                    "image_path": img_path
-                })
-                return f"I've generated a visualization for you: **{image_prompt}**"
-        
-        # Optimization: We already have the full content from the first request.
-        # Returning it directly is faster and more reliable than starting a new stream.
-        content = message.get("content")
-        if content:
-            return content
-        
-        return "I couldn't generate a text response."
-
-    except Exception as e:
-        st.error(f"❌ Processing Error: {e}")
-        return "I encountered an error while thinking about your request."
+def respond(messages, vector_store=None):
+    """Answer the pending user message, rendering the chat engine's events as they arrive."""
+    from chat_engine import run_turn_sync
+
+    view = {"placeholder": None, "status": None, "text": ""}
+
+    def on_event(event):
+        kind = event["type"]
+        if kind == "notice":
+            st.info(event["text"])
+        elif kind == "error":
+            st.error(event["message"])
+        elif kind == "tool_start":
+            if event["tool"] == "web_search":
+                view["status"] = st.status("🔍 Searching the web...", expanded=False)
+            else:
+                view["status"] = st.status(f"🎨 Painting: {event['args'].get('prompt')}...", expanded=True)
+        elif kind == "tool_end" and view["status"] is not None:
+            if not event["ok"]:
+                view["status"].update(state="error")
+            elif event["tool"] == "web_search":
+                view["status"].write("Summarizing information...")
+                view["status"].update(state="complete")
+            else:
+                view["status"].update(label="✅ Vision complete!", state="complete")
+        elif kind == "token":
+            if view["placeholder"] is None:
+                view["placeholder"] = st.empty()
+            view["text"] += event["text"]
+            view["placeholder"].markdown(bot_bubble(view["text"]), unsafe_allow_html=True)
+        elif kind == "done":
+            # The full conversation is redrawn on the next rerun
+            if view["placeholder"] is not None and not view["text"]:
+                view["placeholder"].empty()
+
+    return run_turn_sync(messages, vector_store, st.session_state.current_session, on_event=on_event)
 
 def show_user_bubble(text):
     st.markdown(f"""
@@ -658,59 +623,6 @@ def show_user_bubble(text):
     </div>
     """, unsafe_allow_html=True)
 
-def stream_response(payload):
-    response_text = ""
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    try:
-        r = requests.post(GROQ_API_URL, json=payload, headers=headers, stream=True, timeout=30)
-        
-        if r.status_code != 200:
-            try:
-                error_data = r.json()
-                msg = error_data.get('error', {}).get('message', 'Unknown Error')
-                st.error(f"Groq API Error ({r.status_code}): {msg}")
-                return f"⚠️ Error: {msg}"
-            except:
-                st.error(f"Groq API Error ({r.status_code}): Connection failed.")
-                return f"⚠️ Connection error (Status {r.status_code})."
-
-        placeholder = st.empty()
-        placeholder.markdown(loading_bubble(), unsafe_allow_html=True)
-
-        for line in r.iter_lines():
-            if line:
-                decoded_line = line.decode("utf-8").strip()
-                if not decoded_line:
-                    continue
-                if decoded_line.startswith("data: "):
-                    decoded_line = decoded_line[6:] # Strip "data: "
-                if decoded_line == "[DONE]":
-                    break
-                
-                try:
-                    data = json.loads(decoded_line)
-                    delta = data.get("choices", [{}])[0].get("delta", {}).get("content", "")
-                    if delta:
-                        response_text += delta
-                        placeholder.markdown(bot_bubble(response_text), unsafe_allow_html=True)
-                except json.JSONDecodeError:
-                    continue
-        
-        # Final render to remove any artifacts and ensure clean bubble
-        if response_text:
-            placeholder.markdown(bot_bubble(response_text), unsafe_allow_html=True)
-        else:
-            placeholder.empty()
-            return "The AI did not provide an answer. Please try rephrasing."
-            
-    except Exception as e:
-        st.error(f"❌ Streaming Error: {e}")
-        response_text = "Sorry, something went wrong while generating the final response."
-    return response_text
-
 def loading_bubble():
     return """
     <div style='text-align:left; background-color:#f1f0f0; padding:10px; margin:10px; border-radius:10px; max-width:80%; float:left; clear:both;'>
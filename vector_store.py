@@ -0,0 +1,333 @@
+import json
+import os
+import uuid
+from array import array
+from typing import Callable, Iterable, List, Optional, Union
+
+import numpy as np
+
+import config
+
+DTYPES = ("float16", "int8")
+# Metadata filter: {key: value or list of allowed values}, or a predicate on the metadata dict
+Filter = Union[dict, Callable[[dict], bool]]
+
+
+class TextStore:
+    """Append-only pool of UTF-8 strings kept in one bytearray with an offsets array,
+    instead of one Python str (plus a Document and docstore entry) per chunk."""
+
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = array("Q", [0])
+
+    def append(self, text: str):
+        self._data += text.encode("utf-8")
+        self._offsets.append(len(self._data))
+
+    def extend(self, texts: Iterable[str]):
+        for text in texts:
+            self.append(text)
+
+    def __getitem__(self, i: int) -> str:
+        return self._data[self._offsets[i]:self._offsets[i + 1]].decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
+
+
+class CompactVectorStore:
+    """In-memory vector store holding float16 or int8 scalar-quantized embeddings.
+
+    Exposes the subset of LangChain's FAISS vector store API that RAGEngine uses
+    (from_texts, add_texts, merge_from, similarity_search*) and, like it, scores results
+    by squared L2 distance. Vectors live in a FAISS scalar-quantizer index; chunk texts,
+    metadata and ids live in TextStores.
+
+    int8 codes share per-dimension ranges, which grow (re-encoding the stored rows) when
+    vectors outside them are added. Codes of different rows are therefore comparable, and
+    FAISS ranks them directly against the full-precision query, as it does float16 vectors.
+    With a metadata filter, ``k * rescore_factor`` candidates are fetched per round.
+    """
+
+    def __init__(self, embedding_function, dim: int, dtype: str = "float16", rescore_factor: int = None):
+        import faiss
+
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype} (expected one of {', '.join(DTYPES)})")
+        self.embedding_function = embedding_function
+        self.dim = dim
+        self.dtype = dtype
+        self.rescore_factor = rescore_factor or config.VECTOR_RESCORE_FACTOR
+        # int8 ranges are set by the first vectors added (see _fit_ranges)
+        qtype = faiss.ScalarQuantizer.QT_fp16 if dtype == "float16" else faiss.ScalarQuantizer.QT_8bit
+        self.index = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_L2)
+        self._texts = TextStore()
+        self._metadatas = TextStore()
+        self._ids = TextStore()
+        self._rows = {}  # id -> row
+
+    # === Construction ===
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, dtype: str = "float16", **kwargs):
+        vectors = np.asarray(embedding.embed_documents(list(texts)), dtype=np.float32)
+        store = cls(embedding, vectors.shape[1], dtype=dtype, **kwargs)
+        store.add_embeddings(vectors, texts, metadatas, ids)
+        return store
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        texts = list(texts)
+        vectors = np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32)
+        return self.add_embeddings(vectors, texts, metadatas, ids)
+
+    def add_embeddings(self, vectors, texts: List[str], metadatas: Optional[List[dict]] = None,
+                       ids: Optional[List[str]] = None) -> List[str]:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        if self.dtype == "int8" and len(vectors):
+            self._fit_ranges(vectors)
+        self.index.add(vectors)
+        start = len(self._ids)
+        self._texts.extend(texts)
+        self._metadatas.extend(json.dumps(m, separators=(",", ":")) for m in (metadatas or [{}] * len(texts)))
+        self._ids.extend(ids)
+        self._rows.update((id_, start + i) for i, id_ in enumerate(ids))
+        return list(ids)
+
+    def merge_from(self, other: "CompactVectorStore"):
+        if other.dim != self.dim or other.dtype != self.dtype:
+            raise ValueError("Cannot merge vector stores with different dimensions or dtypes.")
+        # Moves the stored codes as-is (like LangChain's FAISS.merge_from, this empties
+        # other.index): nothing is re-embedded or re-quantized
+        n = len(other)
+        start = len(self._ids)
+        if self.dtype == "int8" and n and not self._same_ranges(other):
+            # Codes from other ranges mean other values: re-encode them into ours
+            vectors = other.index.reconstruct_n(0, n)
+            self._fit_ranges(vectors)
+            self.index.add(vectors)
+            other.index.reset()
+        else:
+            self.index.merge_from(other.index)
+        for i in range(n):
+            self._texts.append(other._texts[i])
+            self._metadatas.append(other._metadatas[i])
+            self._ids.append(other._ids[i])
+            self._rows[other._ids[i]] = start + i
+
+    def delete(self, ids: List[str]) -> bool:
+        """Remove chunks by id (unknown ids are ignored); the remaining rows keep their order."""
+        import faiss
+
+        removed = {self._rows[id_] for id_ in ids if id_ in self._rows}
+        if not removed:
+            return False
+        self.index.remove_ids(faiss.IDSelectorBatch(np.fromiter(removed, dtype=np.int64)))
+        keep = [i for i in range(len(self._ids)) if i not in removed]
+        self._texts = self._rebuilt(self._texts, keep)
+        self._metadatas = self._rebuilt(self._metadatas, keep)
+        self._ids = self._rebuilt(self._ids, keep)
+        self._rows = {self._ids[i]: i for i in range(len(self._ids))}
+        return True
+
+    def get_metadata(self, ids: List[str]) -> dict:
+        """Metadata of chunks by id (unknown ids are left out)."""
+        return {id_: self._metadata(self._rows[id_]) for id_ in ids if id_ in self._rows}
+
+    def update_metadata(self, updates: dict):
+        """Replace the metadata of chunks by id, e.g. character spans that moved after an edit."""
+        rows = {self._rows[id_]: metadata for id_, metadata in updates.items() if id_ in self._rows}
+        if not rows:
+            return
+        metadatas = TextStore()
+        for i in range(len(self._metadatas)):
+            metadatas.append(json.dumps(rows[i], separators=(",", ":")) if i in rows else self._metadatas[i])
+        self._metadatas = metadatas
+
+    @staticmethod
+    def _rebuilt(store: TextStore, rows: List[int]) -> TextStore:
+        rebuilt = TextStore()
+        rebuilt.extend(store[i] for i in rows)
+        return rebuilt
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def nbytes(self) -> int:
+        return (self.index.ntotal * self.index.sa_code_size()
+                + self._texts.nbytes + self._metadatas.nbytes + self._ids.nbytes)
+
+    # === Search ===
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Filter] = None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Filter] = None, **kwargs):
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4, filter: Optional[Filter] = None, **kwargs):
+        from langchain_core.documents import Document
+
+        total = len(self)
+        if total == 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        fetch = k * self.rescore_factor if filter else k
+        while True:
+            fetch = min(fetch, total)
+            rows, distances = self._search(query, fetch)
+            if filter:
+                keep = [j for j, i in enumerate(rows) if self._matches(i, filter)]
+                rows, distances = rows[keep], distances[keep]
+            # With a filter, widen the search until enough candidates pass it
+            if not filter or len(rows) >= k or fetch == total:
+                break
+            fetch *= 4
+
+        order = np.argsort(distances)[:k]
+        return [
+            (Document(page_content=self._texts[int(rows[j])], metadata=self._metadata(int(rows[j])),
+                      id=self._ids[int(rows[j])]),
+             float(distances[j]))
+            for j in order
+        ]
+
+    def _search(self, query, fetch):
+        """Return the ``fetch`` nearest rows and their squared L2 distances to ``query``."""
+        distances, rows = self.index.search(query[None, :], fetch)
+        valid = rows[0] >= 0
+        return rows[0][valid], distances[0][valid]
+
+    def _metadata(self, i: int) -> dict:
+        return json.loads(self._metadatas[i])
+
+    def _matches(self, i: int, filter: Filter) -> bool:
+        metadata = self._metadata(i)
+        if callable(filter):
+            return filter(metadata)
+        for key, value in filter.items():
+            allowed = value if isinstance(value, (list, tuple, set)) else [value]
+            if metadata.get(key) not in allowed:
+                return False
+        return True
+
+    # === int8 ranges ===
+    def _ranges(self):
+        """Per-dimension (min, max) that the int8 codes cover."""
+        import faiss
+
+        trained = faiss.vector_to_array(self.index.sq.trained)
+        return trained[:self.dim], trained[:self.dim] + trained[self.dim:]
+
+    def _same_ranges(self, other: "CompactVectorStore") -> bool:
+        return (self.index.is_trained and other.index.is_trained
+                and all(np.array_equal(a, b) for a, b in zip(self._ranges(), other._ranges())))
+
+    def _fit_ranges(self, vectors):
+        """Grow the int8 ranges to cover ``vectors``, re-encoding the stored rows when they change."""
+        import faiss
+
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        if self.index.is_trained:
+            current_low, current_high = self._ranges()
+            if (low >= current_low).all() and (high <= current_high).all():
+                return
+            low, high = np.minimum(low, current_low), np.maximum(high, current_high)
+        stored = self.index.reconstruct_n(0, self.index.ntotal) if self.index.ntotal else None
+        index = faiss.IndexScalarQuantizer(self.dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+        # Min/max training on the two bounds sets exactly these ranges
+        index.train(np.stack([low, high]).astype(np.float32))
+        if stored is not None:
+            index.add(stored)
+        self.index = index
+        self._mapped = False
+
+
+# === Persistence ===
+def save_store(store, directory: str):
+    """Write a vector store (CompactVectorStore or LangChain FAISS) to ``directory`` as plain files.
+
+    store.json describes the store, index.faiss is FAISS's own index format, chunks.jsonl
+    holds one {id, text, metadata} object per index row. Nothing is pickled.
+    """
+    import faiss
+
+    os.makedirs(directory, exist_ok=True)
+    if isinstance(store, CompactVectorStore):
+        info = {"kind": "compact", "dim": store.dim, "dtype": store.dtype, "rescore_factor": store.rescore_factor}
+        rows = ((store._ids[i], store._texts[i], store._metadata(i)) for i in range(len(store)))
+    else:
+        info = {"kind": "faiss", "dim": store.index.d}
+        docs = (store.docstore.search(store.index_to_docstore_id[i]) for i in range(store.index.ntotal))
+        rows = ((doc.id or store.index_to_docstore_id[i], doc.page_content, doc.metadata) for i, doc in enumerate(docs))
+    info["count"] = store.index.ntotal
+    faiss.write_index(store.index, os.path.join(directory, "index.faiss"))
+    with open(os.path.join(directory, "chunks.jsonl"), "w", encoding="utf-8") as f:
+        for id_, text, metadata in rows:
+            f.write(json.dumps({"id": id_, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+    with open(os.path.join(directory, "store.json"), "w", encoding="utf-8") as f:
+        json.dump(info, f)
+
+
+def load_store(directory: str, embeddings, mmap: bool = True):
+    """Load a store written by ``save_store`` without re-embedding anything.
+
+    With ``mmap`` the FAISS vectors are memory-mapped from index.faiss instead of read
+    into memory, so processes loading the same index share its pages; such a store is
+    read-only until ``make_writable`` is called.
+    """
+    import faiss
+
+    with open(os.path.join(directory, "store.json"), encoding="utf-8") as f:
+        info = json.load(f)
+    index = faiss.read_index(os.path.join(directory, "index.faiss"), faiss.IO_FLAG_MMAP_IFC if mmap else 0)
+    with open(os.path.join(directory, "chunks.jsonl"), encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    if len(rows) != index.ntotal:
+        raise ValueError(f"Corrupt vector store in {directory}: {index.ntotal} vectors but {len(rows)} chunks")
+
+    if info["kind"] == "compact":
+        store = CompactVectorStore(embeddings, info["dim"], dtype=info["dtype"], rescore_factor=info["rescore_factor"])
+        scales = os.path.join(directory, "scales.f32")
+        if info["dtype"] == "int8" and os.path.exists(scales):
+            # Saved when int8 codes were scaled per vector: re-encode them into shared ranges
+            vectors = index.reconstruct_n(0, index.ntotal) * np.fromfile(scales, dtype=np.float32)[:, None]
+            if len(vectors):
+                store._fit_ranges(vectors)
+                store.index.add(vectors)
+        else:
+            store.index = index
+        for i, row in enumerate(rows):
+            store._texts.append(row["text"])
+            store._metadatas.append(json.dumps(row["metadata"], separators=(",", ":")))
+            store._ids.append(row["id"])
+            store._rows[row["id"]] = i
+    else:
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+
+        docstore = InMemoryDocstore({row["id"]: Document(page_content=row["text"], metadata=row["metadata"],
+                                                         id=row["id"]) for row in rows})
+        store = FAISS(embeddings, index, docstore, {i: row["id"] for i, row in enumerate(rows)})
+    store._mapped = mmap and store.index is index
+    return store
+
+
+def make_writable(store):
+    """Give a memory-mapped store its own in-memory copy of the index before it is modified
+    (FAISS aborts the process when a mapped index is resized)."""
+    import faiss
+
+    if getattr(store, "_mapped", False):
+        store.index = faiss.deserialize_index(faiss.serialize_index(store.index))
+        store._mapped = False
+    return store